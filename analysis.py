@@ -1,119 +1,453 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import io
 import os
-from fpdf import FPDF
+import threading
+import metrics
 import streamlit as st
-import matplotlib
-matplotlib.use('Agg')
+from montecarlo import simulate_paths, simulate_portfolio
+import price_store
+import bar_store
+import vol_state
+import report_cache
+import mc_cache
+from downsample import DEFAULT_POINTS, PDF_POINTS, downsample_frame
+import stress
+import vol_models
+import divergence
+from risk_engine import DEFAULT_WINDOWS, compute_risk_metrics, covariance, latest, simple_returns
+
+FILE_MAP = {
+    'bitcoin': 'cleaned_BTC_USD_daily_data.csv', 'ethereum': 'cleaned_ETH_USD_daily_data.csv',
+    'binancecoin': 'cleaned_BNB_USD_daily_data.csv', 'bitcoin-cash': 'cleaned_BCH_USD_daily_data.csv',
+    'dogecoin': 'cleaned_DOGE_USD_daily_data.csv', 'solana': 'cleaned_SOL_USD_daily_data.csv',
+    'tron': 'cleaned_TRX_USD_daily_data.csv', 'usdc': 'cleaned_USDC_USD_daily_data.csv',
+    'tether': 'cleaned_USDT_USD_daily_data.csv', 'figr': 'cleaned_FIGR_HELOC_USD_daily_data.csv'
+}
+# Display names, which is what history.coin holds for configured assets (app.py's `coins` is
+# the same map inverted, kept literal there so the login rerun does not import this module)
+COIN_NAMES = {
+    'bitcoin': 'Bitcoin', 'ethereum': 'Ethereum', 'binancecoin': 'Binance Coin', 'bitcoin-cash': 'Bitcoin Cash',
+    'dogecoin': 'Dogecoin', 'solana': 'Solana', 'tron': 'Tron', 'usdc': 'USDC', 'tether': 'Tether', 'figr': 'FIGR HELOC'
+}
+# Specific overrides for your merged file structure if needed
+COL_MAP = {
+    'binancecoin': 'Close', 'bitcoin-cash': 'Close', 'ethereum': 'Close.1', 'bitcoin': 'Close.1',
+    'solana': 'Close.2', 'dogecoin': 'Close.3', 'tron': 'Close.3', 'usdc': 'Close.4',
+    'tether': 'Close.4', 'figr': 'Close.5'
+}
+
+# 30-day annualized vol above which an asset is CRITICAL / MODERATE
+RISK_THRESHOLDS = (0.7, 0.4)
+
+def classify_risk(vol):
+    critical, moderate = RISK_THRESHOLDS
+    return "CRITICAL" if vol > critical else "MODERATE" if vol > moderate else "STABLE"
+
+# Volatility inputs for the risk score and forecasts: label -> get_risk_snapshot column
+VOL_MODELS = {"Close-to-Close 30D": "vol_30d", "EWMA (λ 0.94)": "ewma_vol", "GARCH(1,1)": "garch_vol",
+              "Parkinson 30D": "parkinson_30d", "Garman-Klass 30D": "garman_klass_30d"}
+OHLC_FIELDS = ('open', 'high', 'low', 'close')
+
+def model_vol(risk, column, days=1):
+    # Annualized vol from a get_risk_snapshot row; GARCH averages its variance forecast over
+    # `days`. Falls back to vol_30d where a model has no estimate (no OHLC columns, short history).
+    if column == 'garch_vol': v = vol_models.garch_term_vol(risk['garch_vol'], risk['garch_long_run'], risk['garch_persistence'], days)
+    else: v = risk[column]
+    return float(v) if np.isfinite(v) else float(risk['vol_30d'])
+
+def resolve_close_column(coin_id, columns):
+    # Smart Column Selection
+    if 'Close' in columns: actual_col = 'Close'
+    elif 'Close.1' in columns: actual_col = 'Close.1' # Common in merged files
+    else: actual_col = columns[0] # Fallback to 1st data column
+    if coin_id in COL_MAP and COL_MAP[coin_id] in columns:
+        actual_col = COL_MAP[coin_id]
+    return actual_col
+
+def _source_table(coin_id):
+    filename = FILE_MAP.get(coin_id)
+    if not filename or not os.path.exists(filename): return None, None
+    table = price_store.load(filename)
+    return table, resolve_close_column(coin_id, table.columns)
+
+def _bar_symbol(coin_id, resolution='1d'):
+    # Intraday symbols come from bar_store; a configured csv asset wins at daily resolution
+    return bar_store.exists(coin_id) and (resolution != '1d' or _source_table(coin_id)[0] is None)
+
+def load_price_series(coin_id):
+    # (table, label, times, prices) off the memory-mapped store plus any streamed tail bars, or None.
+    # bar_store symbols come back as (None, None, daily times, daily closes).
+    if _bar_symbol(coin_id):
+        bars = bar_store.load(coin_id, '1d')
+        return None, None, bars['time'].view('datetime64[ns]'), bars['close']
+    table, label = _source_table(coin_id)
+    if table is None: return None
+    times, prices = table.dates, table.column(label)
+    tail = vol_state.read_tail(coin_id)
+    if not tail.empty:
+        tail = tail[tail['time'] > times[-1]]
+        times = np.concatenate([times, tail['time'].to_numpy(dtype='datetime64[ns]')])
+        prices = np.concatenate([prices, tail['price'].to_numpy(dtype=np.float64)])
+    return table, label, times, prices
+
+def _ohlc_labels(label, columns):
+    # 'Close.2' -> {'open': 'Open.2', 'high': 'High.2', 'low': 'Low.2'}, for the labels present
+    base, dot, suffix = label.partition('.')
+    if base != 'Close': return {}
+    labels = {f: f"{f.capitalize()}{dot}{suffix}" for f in OHLC_FIELDS[:3]}
+    return {f: l for f, l in labels.items() if l in columns}
+
+def load_ohlc_series(coin_id):
+    # (times, {field: prices}) like load_price_series; open/high/low are NaN where only a close
+    # is known (streamed tail bars, a csv without range columns) and absent fields are omitted
+    if _bar_symbol(coin_id):
+        bars = bar_store.load(coin_id, '1d')
+        return bars['time'].view('datetime64[ns]'), {f: bars[f] for f in OHLC_FIELDS}
+    series = load_price_series(coin_id)
+    if series is None: return None
+    table, label, times, closes = series
+    out = {'close': closes}
+    for f, l in _ohlc_labels(label, table.columns).items():
+        col = table.column(l)
+        out[f] = np.concatenate([col, np.full(len(times) - len(col), np.nan)])
+    return times, out
+
+_cache_miss = threading.local()
+
+def _cached_call(cache, fn, *args):
+    # Counts st.cache_data hits/misses: the wrapped function sets the flag only when it runs
+    _cache_miss.flag = False
+    out = fn(*args)
+    metrics.incr(f"cache.{cache}.{'miss' if _cache_miss.flag else 'hit'}")
+    return out
+
+def price_frame(times, prices, periods=365):
+    # vol_30d is the 30-bar volatility annualized with `periods` bars per year
+    sub_df = pd.DataFrame({'time': times, 'price': prices}).dropna()
+    sub_df['returns'] = sub_df['price'].pct_change()
+    sub_df['vol_30d'] = sub_df['returns'].rolling(30, min_periods=1).std() * np.sqrt(periods)
+    return sub_df[['time', 'price', 'vol_30d']].fillna(0)
+
+def data_version(coin_id):
+    if _bar_symbol(coin_id): return f"bars:{bar_store.version(coin_id)}"
+    table, _ = _source_table(coin_id)
+    if table is None: return None
+    return f"{table.version}:{vol_state.tail_version(coin_id)}"
+
+@st.cache_data(ttl=600)
+def _history_frame(coin_id, version):
+    _cache_miss.flag = True
+    table, label = _source_table(coin_id)
+    return price_frame(table.dates, table.column(label))
+
+@st.cache_data(ttl=600, max_entries=128)
+def _bar_frame(symbol, version, resolution, start, end):
+    _cache_miss.flag = True
+    bars = bar_store.load(symbol, resolution, start, end)
+    return price_frame(bars['time'].view('datetime64[ns]'), bars['close'], bar_store.PERIODS_PER_YEAR[resolution])
+
+@metrics.timed("get_data")
+def get_data(coin_id, resolution='1d', start=None, end=None):
+    # Configured assets: source history is computed once per csv version; streamed bars
+    # already carry their vol_30d. Any bar_store symbol can be read at any resolution in
+    # bar_store.RESOLUTIONS, optionally limited to start <= time < end; csv-only assets are
+    # daily, and asking them for another resolution is a ValueError rather than daily bars.
+    if resolution not in bar_store.RESOLUTIONS: raise ValueError(f"Unknown resolution '{resolution}', expected one of {list(bar_store.RESOLUTIONS)}")
+    if resolution != '1d' and not _bar_symbol(coin_id, resolution):
+        raise ValueError(f"'{coin_id}' has no intraday bars in the bar store; only '1d' is available")
+    try:
+        if _bar_symbol(coin_id, resolution):
+            return _cached_call('bar_frame', _bar_frame, coin_id, bar_store.version(coin_id), resolution, start, end)
+        table, label = _source_table(coin_id)
+        if table is None: return pd.DataFrame()
+        df = _cached_call('history_frame', _history_frame, coin_id, table.version)
+        tail = vol_state.read_tail(coin_id)
+        if not tail.empty:
+            vol_state.get_state(coin_id, table.dates, table.column(label), table.version)  # re-derive tail vols if the csv moved
+            tail = vol_state.read_tail(coin_id)
+            tail = tail[tail['time'] > table.dates[-1]]
+        df = df if tail.empty else pd.concat([df, tail], ignore_index=True)
+        if start is not None or end is not None:
+            keep = np.ones(len(df), dtype=bool)
+            if start is not None: keep &= (df['time'] >= pd.Timestamp(start)).to_numpy()
+            if end is not None: keep &= (df['time'] < pd.Timestamp(end)).to_numpy()
+            df = df[keep].reset_index(drop=True)
+        return df
+    except: return pd.DataFrame()
+
+@st.cache_data(ttl=600, max_entries=256)
+def _chart_series(coin_id, version, range_days, points, method):
+    df = get_data(coin_id)
+    _cache_miss.flag = True  # after get_data, whose own hit/miss accounting resets the flag
+    if df.empty: return df
+    if range_days: df = df[df['time'] >= df['time'].iloc[-1] - pd.Timedelta(days=range_days)]
+    return downsample_frame(df, 'time', 'price', points, method)
+
+def get_chart_series(coin_id, range_days=None, points=DEFAULT_POINTS, method='lttb'):
+    # Price history trimmed to the last range_days (None = all) and reduced to ~points rows
+    return _cached_call('chart_series', _chart_series, coin_id, data_version(coin_id), range_days, points, method)
+
+def append_bars(coin_id, bars):
+    # Feed new (time, price) bars for one asset; returns the updated VolState and counts
+    table, label = _source_table(coin_id)
+    if table is None: raise KeyError(f"Unknown asset '{coin_id}'")
+    return vol_state.append_bars(coin_id, bars, table.dates, table.column(label), table.version)
+
+def append_bar_file(path):
+    # File-drop stand-in: csv with coin, time, price columns
+    bars = pd.read_csv(path, parse_dates=['time'])
+    return {c: append_bars(c, zip(g['time'], g['price']))[1] for c, g in bars.groupby('coin', sort=False)}
+
+def get_close_matrix(coin_ids):
+    # (dates, closes, ids) with closes aligned on the union of the assets' dates
+    series = {c: load_price_series(c) for c in coin_ids}
+    series = {c: s for c, s in series.items() if s is not None}
+    if not series: return np.array([], dtype='datetime64[ns]'), np.empty((0, 0)), []
+    ids = list(series)
+    dates = np.unique(np.concatenate([s[2] for s in series.values()]))
+    closes = np.full((len(dates), len(ids)), np.nan)
+    for j, c in enumerate(ids):
+        _, _, times, prices = series[c]
+        closes[np.searchsorted(dates, times), j] = prices
+    return dates, closes, ids
+
+def get_ohlc_matrix(coin_ids):
+    # (dates, {field: closes-shaped matrix}, ids) aligned like get_close_matrix; NaN = no value
+    series = {c: load_ohlc_series(c) for c in coin_ids}
+    series = {c: s for c, s in series.items() if s is not None}
+    if not series: return np.array([], dtype='datetime64[ns]'), {f: np.empty((0, 0)) for f in OHLC_FIELDS}, []
+    ids = list(series)
+    dates = np.unique(np.concatenate([s[0] for s in series.values()]))
+    ohlc = {f: np.full((len(dates), len(ids)), np.nan) for f in OHLC_FIELDS}
+    for j, c in enumerate(ids):
+        times, fields = series[c]
+        rows = np.searchsorted(dates, times)
+        for f, values in fields.items(): ohlc[f][rows, j] = values
+    return dates, ohlc, ids
 
 @st.cache_data(ttl=600)
-def get_data(coin_id):
-    file_map = {
-        'bitcoin': 'cleaned_BTC_USD_daily_data.csv', 'ethereum': 'cleaned_ETH_USD_daily_data.csv',
-        'binancecoin': 'cleaned_BNB_USD_daily_data.csv', 'bitcoin-cash': 'cleaned_BCH_USD_daily_data.csv',
-        'dogecoin': 'cleaned_DOGE_USD_daily_data.csv', 'solana': 'cleaned_SOL_USD_daily_data.csv',
-        'tron': 'cleaned_TRX_USD_daily_data.csv', 'usdc': 'cleaned_USDC_USD_daily_data.csv',
-        'tether': 'cleaned_USDT_USD_daily_data.csv', 'figr': 'cleaned_FIGR_HELOC_USD_daily_data.csv'
-    }
-    filename = file_map.get(coin_id)
-    target_col = coin_id # Placeholder, logic handles column finding
-    
-    if not filename or not os.path.exists(filename): return pd.DataFrame()
+def _risk_snapshot(coin_ids, versions, windows):
+    _cache_miss.flag = True
     try:
-        df = pd.read_csv(filename)
-        date_col = 'Date' if 'Date' in df.columns else df.columns[0]
-        # Smart Column Selection
-        if 'Close' in df.columns: actual_col = 'Close'
-        elif 'Close.1' in df.columns: actual_col = 'Close.1' # Common in merged files
-        else: actual_col = df.columns[1] # Fallback to 2nd column
-        
-        # Specific overrides for your merged file structure if needed
-        col_map = {
-            'binancecoin': 'Close', 'bitcoin-cash': 'Close', 'ethereum': 'Close.1', 'bitcoin': 'Close.1',
-            'solana': 'Close.2', 'dogecoin': 'Close.3', 'tron': 'Close.3', 'usdc': 'Close.4',
-            'tether': 'Close.4', 'figr': 'Close.5'
-        }
-        if coin_id in col_map and col_map[coin_id] in df.columns:
-            actual_col = col_map[coin_id]
-
-        sub_df = df[[date_col, actual_col]].copy()
-        sub_df.columns = ['time', 'price']
-        sub_df['time'] = pd.to_datetime(sub_df['time'], errors='coerce')
-        sub_df['price'] = pd.to_numeric(sub_df['price'], errors='coerce')
-        sub_df = sub_df.dropna().sort_values('time')
-        
-        sub_df['returns'] = sub_df['price'].pct_change()
-        sub_df['vol_30d'] = sub_df['returns'].rolling(30, min_periods=1).std() * np.sqrt(365)
-        return sub_df[['time', 'price', 'vol_30d']].fillna(0)
+        dates, ohlc, ids = get_ohlc_matrix(coin_ids)
+        if not ids: return pd.DataFrame()
+        closes = ohlc['close']
+        m = compute_risk_metrics(closes, windows)
+        last = m['last_row']
+        snap = pd.DataFrame({'price': latest(closes, last)}, index=ids)
+        for w in windows: snap[f'vol_{w}d'] = latest(m['vol'][w], last)
+        snap['ewma_vol'] = latest(m['ewma_vol'], last)
+        snap['parkinson_30d'] = latest(vol_models.parkinson_vol(ohlc['high'], ohlc['low']), last)
+        snap['garman_klass_30d'] = latest(vol_models.garman_klass_vol(ohlc['open'], ohlc['high'], ohlc['low'], closes), last)
+        garch = vol_models.garch_fit(m['returns'])
+        snap['garch_vol'], snap['garch_long_run'] = garch['next_vol'], garch['long_run_vol']
+        snap['garch_alpha'], snap['garch_beta'], snap['garch_persistence'] = garch['alpha'], garch['beta'], garch['persistence']
+        snap['garch_at_bound'] = garch['at_bound']
+        snap['max_drawdown'] = m['max_drawdown']
+        snap['dd_duration'] = m['dd_duration']
+        snap['current_dd_duration'] = m['current_dd_duration']
+        return snap.fillna({f'vol_{w}d': 0 for w in windows})
     except: return pd.DataFrame()
 
-def run_monte_carlo(current_price, vol, days=30, sims=1000):
-    vol = max(vol, 0.01)
-    daily_vol = vol / np.sqrt(365)
-    results = np.zeros((days, sims))
-    for i in range(sims):
-        prices = [current_price]
-        for _ in range(days-1): prices.append(prices[-1] * (1 + np.random.normal(0, daily_vol)))
-        results[:, i] = prices
-    return results
+def get_risk_snapshot(coin_ids, windows=DEFAULT_WINDOWS):
+    # Latest risk metrics for every asset from one batch pass, indexed by coin id
+    versions = tuple(data_version(c) for c in coin_ids)
+    with metrics.timer("risk_snapshot"):
+        return _cached_call('risk_snapshot', _risk_snapshot, tuple(coin_ids), versions, tuple(windows))
+
+def run_monte_carlo(current_price, vol, days=30, sims=1000, seed=None, model='arithmetic'):
+    return simulate_paths(current_price, vol, days, sims, seed=seed, model=model)
+
+def forecast(coin_id, days=30, sims=1000, seed=0, model='arithmetic', vol_model='vol_30d'):
+    # mc_cache summary of a run_monte_carlo from the latest price and the vol_model estimate
+    # (a VOL_MODELS column; GARCH uses its average forecast over the horizon); None without data
+    def compute():
+        df = get_data(coin_id)
+        if df.empty: return None
+        vol = df['vol_30d'].iloc[-1]
+        if vol_model != 'vol_30d':
+            snap = get_risk_snapshot((coin_id,))
+            if coin_id in snap.index: vol = model_vol(snap.loc[coin_id], vol_model, days)
+        return mc_cache.summarize(run_monte_carlo(df['price'].iloc[-1], vol, days, sims, seed, model))
+    return mc_cache.get_or_compute(('forecast', coin_id, data_version(coin_id), days, sims, seed, model, vol_model), compute)
+
+@st.cache_data(ttl=600)
+def _return_covariance(coin_ids, versions, lookback):
+    _cache_miss.flag = True
+    dates, closes, ids = get_close_matrix(coin_ids)
+    returns = simple_returns(closes[-(lookback + 1):])[1:]
+    return ids, covariance(returns)
+
+def get_return_covariance(coin_ids, lookback=365):
+    # (ids, daily covariance) over the last `lookback` rows of the aligned close matrix;
+    # assets without enough overlapping history are dropped
+    versions = tuple(data_version(c) for c in coin_ids)
+    ids, cov = _cached_call('return_covariance', _return_covariance, tuple(coin_ids), versions, lookback)
+    keep = _finite_assets(cov)
+    return [c for c, k in zip(ids, keep) if k], cov[np.ix_(keep, keep)]
+
+def _finite_assets(cov):
+    # Drops the asset with the most non-finite entries until the rest of the matrix is
+    # finite, so one short history costs only its own column rather than every asset
+    keep = np.ones(len(cov), dtype=bool)
+    bad = ~np.isfinite(cov)
+    while bad[np.ix_(keep, keep)].any():
+        counts = np.where(keep, (bad & keep).sum(axis=1), -1)
+        keep[np.argmax(counts)] = False
+    return keep
+
+def run_portfolio_monte_carlo(weights, days=30, sims=10_000, lookback=365, seed=None, model='gbm', workers=None):
+    # weights: {coin_id: weight}. Assets dropped for lack of history are reported in 'skipped'.
+    ids, cov = get_return_covariance(tuple(weights), lookback)
+    if not ids: return None
+    result = simulate_portfolio(cov, [weights[c] for c in ids], days, sims, seed=seed, model=model, workers=workers)
+    result.update(assets=ids, skipped=[c for c in weights if c not in ids], cov=cov)
+    return result
+
+@st.cache_data(ttl=600, max_entries=64)
+def _stress_test(coin_ids, versions, window, horizon, paths, block, weights, seed):
+    _cache_miss.flag = True
+    dates, closes, ids = get_close_matrix(coin_ids)
+    if len(dates) < 3: return None
+    returns, dates = simple_returns(closes)[1:], dates[1:]
+    w = np.array([dict(weights)[c] for c in ids] if weights else np.ones(len(ids)), dtype=np.float64)
+    complete = np.isfinite(returns).all(axis=1)
+    port = np.where(complete, np.nan_to_num(returns) @ (w / w.sum()), np.nan)[:, None]  # daily-rebalanced
+    series = np.hstack([returns, port])
+
+    hist = stress.historical_var(series, window, horizon)
+    recent = series[-window:]
+    boot = stress.block_bootstrap(returns[-window:], horizon, paths, block, seed)
+    boot = np.hstack([boot, stress.portfolio(boot, w)[:, None]])
+    b_var, b_cvar = stress.tail_risk(boot)
+    g_var = stress.gaussian_var(recent, horizon)
+    last = np.where(np.isfinite(hist['var'][0.99]).any(axis=0), series.shape[0] - 1 - np.argmax(np.isfinite(hist['var'][0.99])[::-1], axis=0), 0)
+    cols = np.arange(series.shape[1])
+    table = pd.DataFrame({
+        'hist_var_95': hist['var'][0.95][last, cols], 'hist_cvar_95': hist['cvar'][0.95][last, cols],
+        'hist_var_99': hist['var'][0.99][last, cols], 'hist_cvar_99': hist['cvar'][0.99][last, cols],
+        'boot_var_95': b_var[0.95], 'boot_cvar_95': b_cvar[0.95], 'boot_var_99': b_var[0.99], 'boot_cvar_99': b_cvar[0.99],
+        'gauss_var_99': g_var[0.99],
+    }, index=ids + ['portfolio'])
+    return {'table': table, 'dates': dates, 'rolling': {l: hist['var'][l][:, -1] for l in stress.LEVELS}, 'portfolio_boot': boot[:, -1]}
+
+def get_stress_test(coin_ids, window=365, horizon=10, paths=5000, block=stress.DEFAULT_BLOCK, weights=None, seed=0):
+    # Latest historical and block-bootstrap VaR/CVaR per asset and for the (default equal
+    # weight) portfolio, with the portfolio's rolling historical VaR; cached per asset set,
+    # data versions, window and horizon
+    versions = tuple(data_version(c) for c in coin_ids)
+    weights = tuple(sorted(weights.items())) if weights else None
+    return _cached_call('stress', _stress_test, tuple(coin_ids), versions, window, horizon, paths, block, weights, seed)
+
+@st.cache_data(ttl=600, max_entries=32)
+def _divergence(coin_ids, versions, window, history, stride):
+    _cache_miss.flag = True
+    dates, closes, ids = get_close_matrix(coin_ids)
+    if len(dates) < 3: return None
+    returns = simple_returns(closes)
+    corr, vol = divergence.rolling_corr(returns, window)
+    last = len(dates) - 1
+    ends = np.arange(last, max(last - history, window - 1), -stride)[::-1]
+    return {'ids': ids, 'end': dates[-1], 'corr': corr[0], 'vol': vol[0], 'spread': divergence.vol_spread(vol[0]),
+            'cohesion_dates': dates[ends], 'cohesion': divergence.average_corr(returns, window, ends)}
+
+def get_divergence(coin_ids, window=90, history=365, stride=7):
+    # Rolling correlation and vol-spread matrices over the last `window` rows, plus the mean
+    # pairwise correlation every `stride` rows over the last `history`; cached per asset set,
+    # data versions and window
+    versions = tuple(data_version(c) for c in coin_ids)
+    return _cached_call('divergence', _divergence, tuple(coin_ids), versions, window, history, stride)
 
 def calculate_max_drawdown(df):
     roll_max = df['price'].cummax()
     return (df['price'] / roll_max - 1.0).min()
 
-def generate_pdf_report(user, coin, price, vol, risk, history_df, comparison_data):
+def _png(fig):
+    buf = io.BytesIO(); fig.savefig(buf, format='png', bbox_inches='tight')
+    return buf.getvalue()
+
+# Charts use the Figure API rather than pyplot so reports can render on worker threads.
+# matplotlib and fpdf are imported on first use; most reruns never build a report.
+def render_price_chart(coin, history_df):
+    from matplotlib.figure import Figure
+    history_df = downsample_frame(history_df, 'time', 'price', PDF_POINTS, 'minmax')  # min/max keeps the envelope at print width
+    fig = Figure(figsize=(10, 4.5)); ax = fig.subplots()
+    ax.plot(history_df['time'], history_df['price'], color='#D4AF37', linewidth=1.5)
+    ax.set_title(f"{coin} Historical Performance", fontsize=10); ax.grid(True, alpha=0.3)
+    return _png(fig)
+
+def render_comparison_chart(comparison_data):
+    from matplotlib.figure import Figure
+    names, values = list(comparison_data.keys()), list(comparison_data.values())
+    fig = Figure(figsize=(10, 5.5)); ax = fig.subplots()
+    colors = ['#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF', '#FF9F40', '#D4AF37']
+    ax.bar(names, values, color=colors[:len(names)])
+    ax.set_title("Annualized Volatility Benchmark", fontsize=12); ax.grid(axis='y', alpha=0.3)
+    for label in ax.get_xticklabels(): label.set_rotation(30); label.set_ha('right')
+    return _png(fig)
+
+@metrics.timed("pdf_report")
+def build_pdf_report(user, coin, price, vol, risk, history_df, comparison_data, mdd=None, price_png=None, comparison_png=None):
+    from fpdf import FPDF
+    pdf = FPDF()
+
+    # --- PAGE 1 ---
+    pdf.add_page()
+    # Header
+    pdf.set_fill_color(20, 30, 40); pdf.rect(0, 0, 210, 35, 'F')
+    pdf.set_font("helvetica", "B", 20); pdf.set_text_color(212, 175, 55)
+    pdf.cell(190, 15, "OFFICIAL RISK INTELLIGENCE REPORT", ln=True, align='C')
+
+    # Info
+    pdf.ln(20); pdf.set_text_color(0, 0, 0); pdf.set_font("helvetica", "B", 11)
+    pdf.cell(190, 7, f"Account Holder: {str(user).upper()}", ln=True)
+    pdf.cell(190, 7, f"Asset Analyzed: {str(coin).upper()}", ln=True)
+    pdf.cell(190, 7, f"Data Range: {history_df['time'].iloc[0].date()} to {history_df['time'].iloc[-1].date()}", ln=True)
+
+    # Metrics Table (Yellow Header)
+    pdf.ln(5); pdf.set_font("helvetica", "B", 12); pdf.cell(190, 8, "RISK QUANTIFICATION SUMMARY", ln=True)
+    pdf.set_fill_color(212, 175, 55); pdf.set_text_color(255, 255, 255); pdf.set_font("helvetica", "B", 10)
+    pdf.cell(95, 9, "METRIC", 1, 0, 'C', 1); pdf.cell(95, 9, "VALUE", 1, 1, 'C', 1)
+    pdf.set_text_color(0, 0, 0); pdf.set_font("helvetica", "", 10)
+
+    if mdd is None: mdd = calculate_max_drawdown(history_df)
+    rows = [("Current Market Price", f"${price:,.2f}"), ("Annualized Volatility", f"{vol:.2%}"), ("Max Drawdown (1Y)", f"{mdd:.2%}"), ("Risk Assessment", risk)]
+    for l, v in rows:
+        pdf.cell(95, 9, l, 1); pdf.cell(95, 9, v, 1, 1)
+
+    # Graph Heading
+    pdf.ln(10); pdf.set_font("helvetica", "B", 13)
+    pdf.cell(190, 8, "DETAILED PRICE ACTION TREND", ln=True)
+
+    # Graph (Fills rest of page)
+    if price_png is None: price_png = render_price_chart(coin, history_df)
+    pdf.image(io.BytesIO(price_png), x=10, w=185)
+
+    # --- PAGE 2 ---
+    pdf.add_page(); pdf.set_font("helvetica", "B", 16); pdf.set_text_color(20, 30, 40)
+    pdf.cell(190, 15, "MARKET RISK COMPARISON", ln=True, align='L'); pdf.ln(10)
+
+    if comparison_png is None: comparison_png = render_comparison_chart(comparison_data)
+    pdf.image(io.BytesIO(comparison_png), x=10, w=185)
+
+    pdf.set_y(-15); pdf.set_font("helvetica", "I", 8); pdf.set_text_color(128, 128, 128)
+    pdf.cell(0, 10, "CONFIDENTIAL: Generated by BITRISK ELITE.", align='C')
+    return bytes(pdf.output())
+
+def report_builder(user, coin, coin_id, price, vol, risk, history_df, comparison_data, mdd=None):
+    # Zero-arg build() for report_cache; both chart PNGs are cached on their own keys so a
+    # report for another user or currency reuses them
+    version = data_version(coin_id)
+    comp_key = tuple(sorted((n, float(v)) for n, v in comparison_data.items()))
+    def build():
+        price_png = report_cache.get_or_build(('price_chart', coin_id, version, PDF_POINTS), lambda: render_price_chart(coin, history_df))
+        comparison_png = report_cache.get_or_build(('comparison_chart', comp_key), lambda: render_comparison_chart(comparison_data))
+        return build_pdf_report(user, coin, price, vol, risk, history_df, comparison_data, mdd, price_png, comparison_png)
+    return build
+
+def generate_pdf_report(user, coin, price, vol, risk, history_df, comparison_data, mdd=None):
     try:
-        pdf = FPDF()
-        
-        # --- PAGE 1 ---
-        pdf.add_page()
-        # Header
-        pdf.set_fill_color(20, 30, 40); pdf.rect(0, 0, 210, 35, 'F')
-        pdf.set_font("helvetica", "B", 20); pdf.set_text_color(212, 175, 55)
-        pdf.cell(190, 15, "OFFICIAL RISK INTELLIGENCE REPORT", ln=True, align='C')
-        
-        # Info
-        pdf.ln(20); pdf.set_text_color(0, 0, 0); pdf.set_font("helvetica", "B", 11)
-        pdf.cell(190, 7, f"Account Holder: {str(user).upper()}", ln=True)
-        pdf.cell(190, 7, f"Asset Analyzed: {str(coin).upper()}", ln=True)
-        pdf.cell(190, 7, f"Data Range: {history_df['time'].iloc[0].date()} to {history_df['time'].iloc[-1].date()}", ln=True)
-        
-        # Metrics Table (Yellow Header)
-        pdf.ln(5); pdf.set_font("helvetica", "B", 12); pdf.cell(190, 8, "RISK QUANTIFICATION SUMMARY", ln=True)
-        pdf.set_fill_color(212, 175, 55); pdf.set_text_color(255, 255, 255); pdf.set_font("helvetica", "B", 10)
-        pdf.cell(95, 9, "METRIC", 1, 0, 'C', 1); pdf.cell(95, 9, "VALUE", 1, 1, 'C', 1)
-        pdf.set_text_color(0, 0, 0); pdf.set_font("helvetica", "", 10)
-        
-        mdd = calculate_max_drawdown(history_df)
-        metrics = [("Current Market Price", f"${price:,.2f}"), ("Annualized Volatility", f"{vol:.2%}"), ("Max Drawdown (1Y)", f"{mdd:.2%}"), ("Risk Assessment", risk)]
-        for l, v in metrics:
-            pdf.cell(95, 9, l, 1); pdf.cell(95, 9, v, 1, 1)
-
-        # Graph Heading
-        pdf.ln(10); pdf.set_font("helvetica", "B", 13)
-        pdf.cell(190, 8, "DETAILED PRICE ACTION TREND", ln=True)
-        
-        # Graph (Fills rest of page)
-        fig, ax = plt.subplots(figsize=(10, 4.5))
-        ax.plot(history_df['time'], history_df['price'], color='#D4AF37', linewidth=1.5)
-        ax.set_title(f"{coin} Historical Performance", fontsize=10); ax.grid(True, alpha=0.3)
-        buf = io.BytesIO(); fig.savefig(buf, format='png', bbox_inches='tight'); buf.seek(0); pdf.image(buf, x=10, w=185); plt.close(fig)
-
-        # --- PAGE 2 ---
-        pdf.add_page(); pdf.set_font("helvetica", "B", 16); pdf.set_text_color(20, 30, 40)
-        pdf.cell(190, 15, "MARKET RISK COMPARISON", ln=True, align='L'); pdf.ln(10)
-        
-        names, values = list(comparison_data.keys()), list(comparison_data.values())
-        fig, ax = plt.subplots(figsize=(10, 5.5))
-        colors = ['#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF', '#FF9F40', '#D4AF37']
-        ax.bar(names, values, color=colors[:len(names)])
-        ax.set_title("Annualized Volatility Benchmark", fontsize=12); plt.xticks(rotation=30, ha='right'); ax.grid(axis='y', alpha=0.3)
-        buf = io.BytesIO(); fig.savefig(buf, format='png', bbox_inches='tight'); buf.seek(0); pdf.image(buf, x=10, w=185); plt.close(fig)
-
-        pdf.set_y(-15); pdf.set_font("helvetica", "I", 8); pdf.set_text_color(128, 128, 128)
-        pdf.cell(0, 10, "CONFIDENTIAL: Generated by BITRISK ELITE.", align='C')
-        return bytes(pdf.output())
+        return build_pdf_report(user, coin, price, vol, risk, history_df, comparison_data, mdd)
     except Exception as e:
-        return f"Error: {e}".encode()
\ No newline at end of file
+        return f"Error: {e}".encode()
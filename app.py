@@ -1,13 +1,13 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import numpy as np
-from datetime import datetime
-from streamlit_option_menu import option_menu
-from database import init_db, login_user, add_user, save_history, get_admin_data, delete_history_entry, get_system_stats, purge_all_history
-from analysis import get_data, run_monte_carlo, generate_pdf_report
+import profiler
+profiler.start_run(st.session_state)
+from database import init_db, login_user, add_user, save_history, count_user_history, delete_history_entry, get_system_stats, purge_user_history, get_history_page, get_scan_summary, get_risk_distribution, get_latest_vol, delete_history_range, delete_history_where
+import metrics
 import time 
+# Heavy modules (analysis -> pandas/numpy, plotly, matplotlib, fpdf) are imported inside the
+# pages that use them so the login/hero rerun stays light. option_menu is one of them (its
+# component call loads pandas/pyarrow), so the Login/Register switch is a native st.radio.
+# Set VELOXIS_PROFILE=1 to log import and section timings per rerun (see profiler.py).
 
 # Page Configuration
 st.set_page_config(page_title="VELOXIS QUANT", layout="wide")
@@ -56,33 +56,76 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+profiler.mark("styles")
 init_db()
-coins = {"Bitcoin": "bitcoin", "Ethereum": "ethereum", "Binance Coin": "binancecoin", "Bitcoin Cash": "bitcoin-cash", "Dogecoin": "dogecoin", "Solana": "solana", "Tron": "tron", "USDC": "usdc", "Tether": "tether", "FIGR HELOC": "figr"}
+coins = {"Bitcoin": "bitcoin", "Ethereum": "ethereum", "Binance Coin": "binancecoin", "Bitcoin Cash": "bitcoin-cash", "Dogecoin": "dogecoin", "Solana": "solana", "Tron": "tron", "USDC": "usdc", "Tether": "tether", "FIGR HELOC": "figr"}  # = analysis.COIN_NAMES inverted
+chart_ranges = {"3M": 90, "1Y": 365, "5Y": 5 * 365, "ALL": None}  # days of history per chart range
 currencies = {"USD": {"symbol": "$", "rate": 1.0}, "EUR": {"symbol": "€", "rate": 0.92}, "INR": {"symbol": "₹", "rate": 83.0}}
 
+def get_risk_data(extra=()):
+    from analysis import get_risk_snapshot
+    return get_risk_snapshot(tuple(coins.values()) + tuple(extra))
+
 def get_comp_data():
-    v = {}
-    for n, c in coins.items():
-        d = get_data(c)
-        if not d.empty: v[n] = d['vol_30d'].iloc[-1]
-    return v
+    snap = get_risk_data()
+    return {n: snap.at[c, 'vol_30d'] for n, c in coins.items() if c in snap.index}
+
+def history_pager(key, page_size=50, **filters):
+    # Keyset pagination over history, newest first: session_state[key] keeps the before_id
+    # cursor of each page visited (NEWER pops one, OLDER pushes the last id shown), so any
+    # page costs one index range read. Changing the filters starts again from the top.
+    state = st.session_state.setdefault(key, {"filters": filters, "cursors": [None]})
+    if state["filters"] != filters: state.update(filters=filters, cursors=[None])
+    df = get_history_page(state["cursors"][-1], page_size + 1, **filters)  # one extra row says whether OLDER exists
+    if df.empty and len(state["cursors"]) > 1: state["cursors"].pop(); st.rerun()  # this page was deleted: step back
+    more, df = len(df) > page_size, df.iloc[:page_size]
+    page = len(state["cursors"])
+    b1, b2, b3 = st.columns([1, 2, 1])
+    if b1.button("◀ NEWER", key=f"{key}_newer", disabled=page == 1): state["cursors"].pop(); st.rerun()
+    b2.caption(f"Page {page} · {page_size} rows per page")
+    if b3.button("OLDER ▶", key=f"{key}_older", disabled=not more): state["cursors"].append(int(df['id'].iloc[-1])); st.rerun()
+    return df, (page - 1) * page_size
+
+def audit_report_button(key, build, file_name):
+    # Reports render on report_cache's worker pool; until ready a polling fragment waits
+    # and triggers one full rerun to swap in the download button
+    import report_cache
+    try: pdf_data = report_cache.request(key, build)
+    except Exception as e: st.error(f"Report generation failed: {e}"); return
+    if pdf_data is not None:
+        st.download_button(label="📄 DOWNLOAD AUDIT REPORT", data=pdf_data, file_name=file_name, mime="application/pdf")
+        return
+
+    @st.fragment(run_every=1)
+    def wait_for_report():
+        # A failed build also ends the polling: the full rerun shows its error once
+        try: ready = report_cache.request(key, build) is not None
+        except Exception: ready = True
+        if ready: st.rerun()
+        st.caption("⏳ Preparing audit report...")
+    wait_for_report()
 
 if 'auth' not in st.session_state: st.session_state.auth = False
 if 'user' not in st.session_state: st.session_state.user = None
 
+profiler.mark("sidebar")
 # --- SIDEBAR ---
 with st.sidebar:
     st.markdown("<h2 style='text-align: center; color: #D4AF37; font-family: serif; letter-spacing: 2px;'>VELOXIS QUANT</h2>", unsafe_allow_html=True)
     if not st.session_state.auth:
-        mode = option_menu(None, ["Login", "Register"], icons=['box-arrow-in-right', 'person-plus'], menu_icon="cast", default_index=0, styles={"nav-link-selected": {"background-color": "#D4AF37"}})
+        mode = st.radio("Access", ["Login", "Register"], horizontal=True, label_visibility="collapsed")
         u, p = st.text_input("Entity ID").strip(), st.text_input("Security Key", type='password')
         if st.button("AUTHENTICATE"):
             u_clean = u.lower().strip()
             if mode == "Login" and login_user(u_clean, p): 
+                metrics.event("USER_LOGIN", "SUCCESS", f"{u_clean} authenticated")
                 st.session_state.auth = True; st.session_state.user = u_clean; st.rerun()
-            elif mode == "Register" and add_user(u_clean, p): st.success("Registered! Login now.")
-            else: st.error("Invalid Credentials")
+            elif mode == "Register" and add_user(u_clean, p):
+                metrics.event("USER_REGISTER", "SUCCESS", f"{u_clean} registered"); st.success("Registered! Login now.")
+            else:
+                metrics.event(f"USER_{mode.upper()}", "FAILED", f"{u_clean or '(blank)'} rejected"); st.error("Invalid Credentials")
     else:
+        from streamlit_option_menu import option_menu
         st.info(f"👤 Entity: {st.session_state.user.upper()}")
         if st.session_state.user == "admin":
             curr_code, curr_sym, curr_rate = "USD", "$", 1.0 
@@ -100,6 +143,7 @@ with st.sidebar:
         if st.button("LOGOUT", use_container_width=True): 
             st.session_state.auth = False; st.session_state.user = None; st.rerun()
 
+profiler.mark("page:" + (selected if st.session_state.auth else "hero"))
 if not st.session_state.auth:
     st.markdown("""
         <div class="hero-container">
@@ -117,21 +161,31 @@ if not st.session_state.auth:
 else:
     if selected == "Market Hub":
         st.title("🏛 Asset Intelligence Hub")
+        from bar_store import symbols as stored_symbols
+        streamed = [s for s in stored_symbols() if s not in coins.values()]  # ingested intraday symbols
+        hub_assets = {**coins, **{s: s for s in streamed}}
+        from analysis import VOL_MODELS, classify_risk, get_chart_series, get_data, data_version, model_vol, report_builder
+        import plotly.express as px
+        import math
         with st.form("input_form", border=False):
-            col_s, col_b = st.columns([3, 1])
-            with col_s: asset = st.selectbox("Select Asset", list(coins.keys()))
+            col_s, col_m, col_b = st.columns([2, 1, 1])
+            with col_s: asset = st.selectbox("Select Asset", list(hub_assets.keys()))
+            with col_m: vol_label = st.selectbox("Volatility Model", list(VOL_MODELS))
             with col_b: st.write(""); run = st.form_submit_button("🔍 ANALYZE RISK", use_container_width=True)
         
-        if run: st.session_state.current_asset = asset 
+        if run: st.session_state.current_asset = asset; st.session_state.vol_model = vol_label
             
-        if 'current_asset' in st.session_state:
+        if st.session_state.get('current_asset') in hub_assets:
             target_asset = st.session_state.current_asset
-            df = get_data(coins[target_asset])
+            df = get_data(hub_assets[target_asset])
+            snap = get_risk_data(streamed)
             
-            if not df.empty:
+            if not df.empty and hub_assets[target_asset] in snap.index:
+                risk = snap.loc[hub_assets[target_asset]]
                 price = df['price'].iloc[-1] * curr_rate
-                vol = df['vol_30d'].iloc[-1]
-                risk_level = "CRITICAL" if vol > 0.7 else "MODERATE" if vol > 0.4 else "STABLE"
+                vol_label = st.session_state.get('vol_model', next(iter(VOL_MODELS)))
+                vol = model_vol(risk, VOL_MODELS[vol_label])
+                risk_level = classify_risk(vol)
                 
                 if risk_level == "CRITICAL":
                     line_c = "#FF3B30"  
@@ -141,19 +195,28 @@ else:
                     line_c = "#00CC78"  
 
                 if run:
-                    save_history(st.session_state.user, target_asset, risk_level, vol, "Auto-Log: Risk Scan")
+                    save_history(st.session_state.user, target_asset, risk_level, vol, f"Auto-Log: Risk Scan ({vol_label})", background=True)
 
                 m_cols = st.columns(4)
-                metrics = [("PRICE", f"{curr_sym}{price:,.2f}"), ("VOLATILITY", f"{vol:.2%}"), ("SCORE", f"{int(vol*100)}/100"), ("STATUS", risk_level)]
+                cards = [("PRICE", f"{curr_sym}{price:,.2f}"), ("VOLATILITY", f"{vol:.2%}"), ("SCORE", f"{int(vol*100)}/100"), ("STATUS", risk_level)]
                 for i, col in enumerate(m_cols):
-                    col.markdown(f"""<div class="metric-card"><div class="metric-label">{metrics[i][0]}</div><div class="metric-value">{metrics[i][1]}</div></div>""", unsafe_allow_html=True)
+                    col.markdown(f"""<div class="metric-card"><div class="metric-label">{cards[i][0]}</div><div class="metric-value">{cards[i][1]}</div></div>""", unsafe_allow_html=True)
+                model_note = f"Volatility model: {vol_label}"
+                if VOL_MODELS[vol_label] == 'garch_vol' and math.isfinite(risk['garch_persistence']):
+                    model_note += f" · α {risk['garch_alpha']:.3f} · β {risk['garch_beta']:.3f} · long-run {risk['garch_long_run']:.2%}"
+                    if risk['garch_at_bound']: model_note += f" · persistence at the fit bound ({risk['garch_persistence']:.3f}), not an interior estimate"
+                st.caption(model_note)
                 
                 st.markdown("<br>", unsafe_allow_html=True)
-                pdf_data = generate_pdf_report(st.session_state.user, target_asset, price/curr_rate, vol, risk_level, df, get_comp_data())
-                st.download_button(label="📄 DOWNLOAD AUDIT REPORT", data=pdf_data, file_name=f"Risk_Audit_{target_asset}.pdf", mime="application/pdf")
+                comp_data = get_comp_data()
+                report_key = ('audit_report', target_asset, VOL_MODELS[vol_label], data_version(hub_assets[target_asset]), tuple(sorted(comp_data.items())), curr_code, st.session_state.user)
+                build = report_builder(st.session_state.user, target_asset, hub_assets[target_asset], price/curr_rate, vol, risk_level, df, comp_data, mdd=risk['max_drawdown'])
+                audit_report_button(report_key, build, f"Risk_Audit_{target_asset}.pdf")
                 
                 st.markdown("<br>", unsafe_allow_html=True)
-                fig = px.area(df, x='time', y=df['price']*curr_rate)
+                chart_range = st.radio("Range", list(chart_ranges), index=len(chart_ranges) - 1, horizontal=True, label_visibility="collapsed")
+                chart_df = get_chart_series(hub_assets[target_asset], chart_ranges[chart_range])
+                fig = px.area(chart_df, x='time', y=chart_df['price']*curr_rate)
                 fig.update_traces(line_color=line_c, fillcolor=f"rgba{tuple(int(line_c.lstrip('#')[i:i+2], 16) for i in (0, 2, 4)) + (0.1,)}")
                 fig.update_layout(yaxis_tickprefix=curr_sym, title=f"{target_asset} Price History", height=400, plot_bgcolor='#000000', paper_bgcolor='#FFFFFF')
                 st.plotly_chart(fig, use_container_width=True)
@@ -181,57 +244,184 @@ else:
 
     elif selected == "My Vault":
         st.title("🔐 My Strategic Vault")
-        full_df = get_admin_data()
-        if not full_df.empty:
-            full_df['username_clean'] = full_df['username'].astype(str).str.strip().str.lower()
-            user_df = full_df[full_df['username_clean'] == st.session_state.user.strip().lower()].copy()
-            if not user_df.empty:
-                if st.button("☣️ PURGE ALL RECORDS"): purge_all_history(); st.rerun()
-                user_df.reset_index(drop=True, inplace=True)
-                user_df['No.'] = range(1, len(user_df) + 1)
-                st.dataframe(user_df[['No.', 'coin', 'risk_level', 'volatility', 'timestamp', 'note']], use_container_width=True, hide_index=True)
-                for _, row in user_df.iterrows():
-                    with st.expander(f"Entry #{row['No.']} | {row['coin']}"):
-                        st.info(f"**Note:** {row['note']}")
-                        if st.button(f"🗑️ Delete Record #{row['No.']}", key=f"del_{row['id']}"):
-                            delete_history_entry(row['id']); st.rerun()
-            else: st.warning("Vault is empty.")
+        vault_user = st.session_state.user.strip().lower()
+        total = count_user_history(vault_user)
+        if total:
+            if st.button("☣️ PURGE ALL RECORDS"): purge_user_history(vault_user); st.rerun()
+            st.caption(f"{total} records")
+            user_df, offset = history_pager("vault_pages", username=vault_user)
+            user_df['No.'] = range(offset + 1, offset + len(user_df) + 1)
+            st.dataframe(user_df[['No.', 'coin', 'risk_level', 'volatility', 'timestamp', 'note']], use_container_width=True, hide_index=True)
+            if not user_df.empty:  # no record picker or deletes for an empty page
+                entries = {f"Entry #{n} | {c}": i for n, c, i in zip(user_df['No.'], user_df['coin'], user_df['id'])}
+                c1, c2 = st.columns([3, 1])
+                with c1: entry = st.selectbox("Record", list(entries), label_visibility="collapsed")
+                with c2:
+                    if st.button("🗑️ DELETE RECORD", use_container_width=True): delete_history_entry(int(entries[entry])); st.rerun()
+                if st.button("🗑️ DELETE THIS PAGE"):
+                    # The page is a contiguous run of this user's ids, so one range delete covers it
+                    delete_history_range(int(user_df['id'].min()), int(user_df['id'].max()), username=vault_user); st.rerun()
+        else: st.warning("Vault is empty.")
 
     elif selected == "Divergence":
         st.title("⚖️ Risk Divergence")
-        c1, c2 = st.columns(2)
-        with c1: a1 = st.selectbox("Asset A", list(coins.keys()), index=0)
-        with c2: a2 = st.selectbox("Asset B", list(coins.keys()), index=1)
-        if st.button("⚖️ ANALYZE DIVERGENCE", use_container_width=True):
-            d1, d2 = get_data(coins[a1]), get_data(coins[a2])
-            if not d1.empty and not d2.empty:
-                v1, v2 = d1['vol_30d'].iloc[-1], d2['vol_30d'].iloc[-1]
-                st.plotly_chart(go.Figure(data=[
-                    go.Bar(name=a1, x=['Volatility'], y=[v1], marker_color='#D4AF37', text=[f"{v1:.2%}"], textposition='auto'), 
-                    go.Bar(name=a2, x=['Volatility'], y=[v2], marker_color='#1A1A1A', text=[f"{v2:.2%}"], textposition='auto')
-                ]).update_layout(template="plotly_white", barmode='group'), use_container_width=True)
+        div_mode = st.radio("Mode", ["Pair", "Matrix"], horizontal=True)
+        import plotly.graph_objects as go
+        if div_mode == "Pair":
+            c1, c2 = st.columns(2)
+            with c1: a1 = st.selectbox("Asset A", list(coins.keys()), index=0)
+            with c2: a2 = st.selectbox("Asset B", list(coins.keys()), index=1)
+            if st.button("⚖️ ANALYZE DIVERGENCE", use_container_width=True):
+                snap = get_risk_data()
+                if coins[a1] in snap.index and coins[a2] in snap.index:
+                    v1, v2 = snap.at[coins[a1], 'vol_30d'], snap.at[coins[a2], 'vol_30d']
+                    st.plotly_chart(go.Figure(data=[
+                        go.Bar(name=a1, x=['Volatility'], y=[v1], marker_color='#D4AF37', text=[f"{v1:.2%}"], textposition='auto'), 
+                        go.Bar(name=a2, x=['Volatility'], y=[v2], marker_color='#1A1A1A', text=[f"{v2:.2%}"], textposition='auto')
+                    ]).update_layout(template="plotly_white", barmode='group'), use_container_width=True)
+        else:
+            import numpy as np
+            import pandas as pd
+            from bar_store import symbols as stored_symbols
+            from analysis import get_divergence
+            from divergence import ranked_pairs
+            div_assets = {**coins, **{s: s for s in stored_symbols() if s not in coins.values()}}
+            c1, c2 = st.columns([3, 1])
+            with c1: picks = st.multiselect("Assets", list(div_assets), default=list(div_assets))
+            with c2: window = st.select_slider("Window (days)", [30, 60, 90, 180, 365], value=90)
+            res = get_divergence(tuple(div_assets[a] for a in picks), window) if len(picks) >= 2 else None
+            if len(picks) < 2: st.info("Pick at least two assets.")
+            elif res is None: st.error("Not enough price history for the selected assets.")
+            else:
+                # One vectorized pass over the aligned close matrix, cached per window and data version
+                names = {v: k for k, v in div_assets.items()}
+                labels = [names[c] for c in res['ids']]
+                h1, h2 = st.columns(2)
+                with h1:
+                    fig = go.Figure(go.Heatmap(z=res['corr'], x=labels, y=labels, zmin=-1, zmax=1, colorscale='RdBu', colorbar=dict(title="ρ")))
+                    fig.update_layout(title=f"{window}-Day Return Correlation", template="plotly_white", yaxis_autorange='reversed', height=520)
+                    st.plotly_chart(fig, use_container_width=True)
+                with h2:
+                    fig = go.Figure(go.Heatmap(z=res['spread'] * 100, x=labels, y=labels, zmid=0, colorscale='BrBG_r', colorbar=dict(title="pts")))
+                    fig.update_layout(title=f"{window}-Day Volatility Spread (row − column, %)", template="plotly_white", yaxis_autorange='reversed', height=520)
+                    st.plotly_chart(fig, use_container_width=True)
+
+                p1, p2 = st.columns(2)
+                with p1:
+                    st.markdown("### 🔀 Most Divergent Pairs")
+                    pairs = ranked_pairs(res['corr'])
+                    st.dataframe(pd.DataFrame({"Pair": [f"{labels[i]} / {labels[j]}" for i, j, _ in pairs], "Correlation": [round(v, 3) for _, _, v in pairs]}), use_container_width=True, hide_index=True)
+                with p2:
+                    st.markdown("### 📏 Widest Volatility Spreads")
+                    pairs = ranked_pairs(np.abs(res['spread']), ascending=False)
+                    st.dataframe(pd.DataFrame({"Pair": [f"{labels[i]} / {labels[j]}" for i, j, _ in pairs],
+                                               "Spread": [f"{res['spread'][i, j]:+.2%}" for i, j, _ in pairs]}), use_container_width=True, hide_index=True)
+
+                fig = go.Figure(go.Scatter(x=res['cohesion_dates'], y=res['cohesion'], line=dict(color='#D4AF37', width=2)))
+                fig.update_layout(title=f"Average Pairwise {window}-Day Correlation", template="plotly_white", yaxis_range=[-1, 1], height=320)
+                st.plotly_chart(fig, use_container_width=True)
+                st.caption(f"Window ending {pd.Timestamp(res['end']).date()}. Each pair uses only the days both assets traded; pairs overlapping less than half the window are blank.")
 
     elif selected == "Probability":
         st.title("🎲 Monte Carlo Forecast")
-        c1, c2 = st.columns([1, 2])
-        with c1: asset = st.selectbox("Target Asset", list(coins.keys()))
-        with c2: days = st.slider("Forecast Horizon", 7, 90, 30)
+        mc_mode = st.radio("Mode", ["Single Asset", "Portfolio", "Stress Test"], horizontal=True)
+        import numpy as np
+        import plotly.graph_objects as go
+        if mc_mode == "Portfolio":
+            from analysis import run_portfolio_monte_carlo
+            c1, c2 = st.columns([2, 1])
+            with c1: picks = st.multiselect("Portfolio Assets", list(coins.keys()), default=["Bitcoin", "Solana", "Tron"])
+            with c2: capital = st.number_input(f"Portfolio Value ({curr_code})", min_value=1.0, value=10000.0 * curr_rate, step=1000.0)
+            wcols = st.columns(max(len(picks), 1))
+            weights = {coins[a]: wcols[i].number_input(f"{a} %", 0.0, 100.0, round(100 / len(picks), 2), key=f"w_{a}") for i, a in enumerate(picks)}
+            c3, c4 = st.columns(2)
+            with c3: days = st.slider("Forecast Horizon", 7, 90, 30)
+            with c4: sims = st.select_slider("Simulations", [10_000, 50_000, 100_000, 250_000], value=100_000)
+
+            if st.button("🎲 RUN PORTFOLIO SIMULATION", use_container_width=True):
+                if not picks or sum(weights.values()) <= 0: st.error("Pick at least one asset with a positive weight.")
+                else:
+                    with st.spinner("Simulating correlated paths..."):
+                        res = run_portfolio_monte_carlo(weights, days, sims)
+                    if res is None: st.error("Not enough price history for the selected assets.")
+                    else:
+                        names = {v: k for k, v in coins.items()}
+                        if res['skipped']: st.warning("Skipped (insufficient history): " + ", ".join(names[c] for c in res['skipped']))
+                        bands, x = res['bands'], list(range(days))
+                        fig = go.Figure([
+                            go.Scatter(x=x, y=bands[95] * capital, line=dict(width=0), showlegend=False, hoverinfo='skip'),
+                            go.Scatter(x=x, y=bands[5] * capital, fill='tonexty', fillcolor='rgba(212,175,55,0.25)', line=dict(width=0), name="5-95% band"),
+                            go.Scatter(x=x, y=bands[50] * capital, line=dict(color='#D4AF37', width=2), name="Median"),
+                        ])
+                        fig.update_layout(title=f"Portfolio Value Bands ({curr_code})", template="plotly_white", yaxis_tickprefix=curr_sym, xaxis_title="Day")
+                        st.plotly_chart(fig, use_container_width=True)
+                        m1, m2, m3, m4 = st.columns(4)
+                        m1.metric("VaR 95%", f"{curr_sym}{res['var'][0.95] * capital:,.2f}", f"{res['var'][0.95]:.2%}", delta_color="off")
+                        m2.metric("CVaR 95%", f"{curr_sym}{res['cvar'][0.95] * capital:,.2f}", f"{res['cvar'][0.95]:.2%}", delta_color="off")
+                        m3.metric("VaR 99%", f"{curr_sym}{res['var'][0.99] * capital:,.2f}", f"{res['var'][0.99]:.2%}", delta_color="off")
+                        m4.metric("CVaR 99%", f"{curr_sym}{res['cvar'][0.99] * capital:,.2f}", f"{res['cvar'][0.99]:.2%}", delta_color="off")
+                        st.caption(f"{sims:,} correlated paths over {days} days · losses are over the full horizon from a {curr_sym}{capital:,.0f} buy-and-hold position.")
+        elif mc_mode == "Stress Test":
+            import pandas as pd
+            from analysis import get_stress_test
+            from downsample import downsample
+            picks = st.multiselect("Assets", list(coins.keys()), default=["Bitcoin", "Solana", "Tron"])
+            c1, c2, c3 = st.columns(3)
+            with c1: window = st.select_slider("History Window (days)", [90, 180, 365, 730], value=180)
+            with c2: horizon = st.slider("Loss Horizon (days)", 1, 30, 10)
+            with c3: paths = st.select_slider("Bootstrap Paths", [1000, 5000, 20000], value=5000)
+
+            if st.button("🧪 RUN STRESS TEST", use_container_width=True):
+                res = get_stress_test(tuple(coins[a] for a in picks), window, horizon, paths) if picks else None
+                if res is None: st.error("Pick at least one asset with price history.")
+                else:
+                    names = {v: k for k, v in coins.items()}
+                    table = res['table'].rename(index=lambda c: names.get(c, "Portfolio (equal weight)"))
+                    table.columns = ["Hist VaR 95", "Hist CVaR 95", "Hist VaR 99", "Hist CVaR 99", "Boot VaR 95", "Boot CVaR 95", "Boot VaR 99", "Boot CVaR 99", "Gaussian VaR 99"]
+                    st.markdown(f"### {horizon}-Day Loss at Confidence (fraction of value)")
+                    st.dataframe(table.style.format("{:.2%}"), use_container_width=True)
+
+                    roll = res['rolling']
+                    idx = downsample(res['dates'], roll[0.99])
+                    fig = go.Figure([go.Scatter(x=res['dates'][idx], y=roll[l][idx] * 100, name=f"VaR {l:.0%}") for l in roll])
+                    fig.update_layout(title=f"Portfolio Rolling Historical {horizon}-Day VaR ({window}-day window)", template="plotly_white", yaxis_ticksuffix="%")
+                    st.plotly_chart(fig, use_container_width=True)
+
+                    counts, edges = np.histogram(res['portfolio_boot'] * 100, bins=60)  # binned here, not shipped as raw paths
+                    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, marker_color='#D4AF37'))
+                    fig.add_vline(x=-table.at["Portfolio (equal weight)", "Boot VaR 99"] * 100, line_dash="dash", line_color="#C62828", annotation_text="VaR 99%")
+                    fig.update_layout(title=f"Block-Bootstrap Portfolio {horizon}-Day Returns ({paths:,} paths)", template="plotly_white", xaxis_ticksuffix="%", bargap=0)
+                    st.plotly_chart(fig, use_container_width=True)
+                    st.caption("Historical: empirical quantiles of overlapping returns over the window. Bootstrap: 10-day blocks of whole-market days resampled from the same window. Gaussian: normal-theory VaR from the window's volatility, for contrast with the fat tails.")
+        else:
+            from analysis import VOL_MODELS
+            c1, c2, c3 = st.columns([1, 1, 2])
+            with c1: asset = st.selectbox("Target Asset", list(coins.keys()))
+            with c2: vol_label = st.selectbox("Volatility Model", list(VOL_MODELS))
+            with c3: days = st.slider("Forecast Horizon", 7, 90, 30)
+        import mc_cache
+        from analysis import forecast
         
-        if st.button("🎲 RUN SIMULATION", use_container_width=True):
-            df = get_data(coins[asset])
-            if not df.empty:
-                paths = run_monte_carlo(df['price'].iloc[-1], df['vol_30d'].iloc[-1], days)
-                final_paths = paths * curr_rate 
-                
-                fig = px.line(final_paths[:, :50], title=f"Future Price Projections ({curr_code})")
-                fig.update_layout(showlegend=False, template="plotly_white", yaxis_tickprefix=curr_sym)
+        if mc_mode == "Single Asset" and st.button("🎲 RUN SIMULATION", use_container_width=True):
+            summary = forecast(coins[asset], days, vol_model=VOL_MODELS[vol_label])
+            if summary is not None:
+                # Served from mc_cache when this asset/horizon was already simulated on this data version
+                band = lambda p: mc_cache.band(summary, p) * curr_rate
+                x = list(range(days))
+                fig = go.Figure([go.Scatter(x=x, y=path, line=dict(color='rgba(26,26,26,0.12)', width=1), showlegend=False, hoverinfo='skip') for path in summary['sample'].T * curr_rate] + [
+                    go.Scatter(x=x, y=band(95), line=dict(width=0), showlegend=False, hoverinfo='skip'),
+                    go.Scatter(x=x, y=band(5), fill='tonexty', fillcolor='rgba(212,175,55,0.15)', line=dict(width=0), name="5-95%"),
+                    go.Scatter(x=x, y=band(75), line=dict(width=0), showlegend=False, hoverinfo='skip'),
+                    go.Scatter(x=x, y=band(25), fill='tonexty', fillcolor='rgba(212,175,55,0.35)', line=dict(width=0), name="25-75%"),
+                    go.Scatter(x=x, y=band(50), line=dict(color='#D4AF37', width=2), name="Median"),
+                ])
+                fig.update_layout(title=f"Future Price Projections ({curr_code})", template="plotly_white", yaxis_tickprefix=curr_sym, xaxis_title="Day")
                 st.plotly_chart(fig, use_container_width=True)
 
-                final = final_paths[-1]
                 s1, s2, s3 = st.columns(3)
-                s1.metric("📉 WORST CASE", f"{curr_sym}{np.percentile(final, 5):,.2f}")
-                s2.metric("🎯 MEDIAN", f"{curr_sym}{final.mean():,.2f}")
-                s3.metric("📈 BEST CASE", f"{curr_sym}{np.percentile(final, 95):,.2f}")
+                s1.metric("📉 WORST CASE", f"{curr_sym}{mc_cache.terminal_quantile(summary, 5) * curr_rate:,.2f}")
+                s2.metric("🎯 MEDIAN", f"{curr_sym}{summary['mean'] * curr_rate:,.2f}")
+                s3.metric("📈 BEST CASE", f"{curr_sym}{mc_cache.terminal_quantile(summary, 95) * curr_rate:,.2f}")
                 
                 st.markdown("---")
                 st.markdown("### 🔍 Risk Pattern Intelligence Decoder")
@@ -259,41 +449,99 @@ else:
 
     elif selected == "System Logs" and st.session_state.user == "admin":
         st.title("📊 System Diagnostics & Health")
+        import pandas as pd
+        from history_writer import writer_counters
         stats = get_system_stats()
-        k1, k2, k3, k4 = st.columns(4)
-        k1.metric("Active Entities", stats.get('users', 0), delta="Stable")
-        k2.metric("Total Analyses", stats.get('analyses', 0), delta="+12%")
-        k3.metric("DB Latency", "12ms", delta="-2ms")
-        k4.metric("System Status", "OPTIMAL", delta_color="normal")
-        
-        st.markdown("### 📜 Recent System Events")
-        log_data = {
-            "Timestamp": [datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "2024-03-15 09:12:01", "2024-03-15 08:45:33"],
-            "Event Type": ["USER_LOGIN", "DB_BACKUP", "SYSTEM_BOOT"],
-            "Status": ["SUCCESS", "SUCCESS", "SUCCESS"],
-            "Details": ["Admin access granted", "Automated backup complete", "Server initialized"]
-        }
-        st.dataframe(pd.DataFrame(log_data), use_container_width=True)
+        db_lat = metrics.combined("db.")
+        caches = ("history_frame", "risk_snapshot", "chart_series", "stress", "divergence", "price_store", "report", "mc")
+        cache_rates = {c: metrics.hit_rate(c) for c in caches}
+        known = [r for r in cache_rates.values() if r is not None]
+        lookups = metrics.counters("cache.")
+        hits, misses = (sum(lookups.get(f"cache.{c}.{k}", 0) for c in caches) for k in ("hit", "miss"))
+        k1, k2, k3, k4, k5 = st.columns(5)
+        k1.metric("Active Entities", stats.get('users', 0))
+        k2.metric("Total Analyses", stats.get('analyses', 0), delta=f"+{metrics.counters('db.rows_written').get('db.rows_written', 0)} since server start", delta_color="off")
+        k3.metric("DB Latency (p50)", f"{db_lat['p50_ms']:.1f}ms" if db_lat else "n/a", delta=f"p99 {db_lat['p99_ms']:.1f}ms" if db_lat else None, delta_color="off")
+        k4.metric("Cache Hit Rate", f"{sum(known) / len(known):.0%}" if known else "n/a", delta=f"{hits} hits / {misses} misses", delta_color="off")
+        k5.metric("DB Size", stats.get('db_size', "n/a"))
+
+        st.markdown("### ⏱️ Latency Percentiles")
+        lat = pd.DataFrame(metrics.summary())
+        if lat.empty: st.info("No timings recorded in this process yet.")
+        else: st.dataframe(lat.round(2), use_container_width=True, hide_index=True)
+
+        c1, c2 = st.columns(2)
+        with c1:
+            st.markdown("### 🧮 Counters")
+            counts = metrics.counters()
+            counts.update({f"cache.{c}.hit_rate": f"{r:.1%}" for c, r in cache_rates.items() if r is not None})
+            writer = writer_counters()
+            if writer: counts.update({f"history_writer.{k}": round(v, 2) for k, v in writer.items()})
+            st.dataframe(pd.DataFrame({"Counter": list(counts), "Value": [str(v) for v in counts.values()]}), use_container_width=True, hide_index=True)
+        with c2:
+            st.markdown("### 📜 Recent System Events")
+            st.dataframe(pd.DataFrame(metrics.recent_events(), columns=["Timestamp", "Event Type", "Status", "Details"]), use_container_width=True, hide_index=True)
+        if st.button("💾 PERSIST METRICS SNAPSHOT"):
+            st.success(f"{metrics.snapshot()} series written to the metrics table.")
 
     elif selected == "User History" and st.session_state.user == "admin":
         st.title("🛡️ Institutional Oversight")
-        df = get_admin_data()
-        if not df.empty:
-            df.reset_index(drop=True, inplace=True)
-            df['No.'] = range(1, len(df) + 1)
+        # Aggregates come from the trigger-maintained summary tables and rows from keyset
+        # pages, so nothing here reads the whole history table
+        import pandas as pd
+        per_user, per_coin, risk_mix = get_scan_summary("username"), get_scan_summary("coin"), get_risk_distribution()
+        k1, k2, k3 = st.columns(3)
+        k1.metric("Total Analyses", int(risk_mix['scans'].sum()))
+        k2.metric("Active Users", len(per_user))
+        k3.metric("Assets Scanned", len(per_coin))
+        if not risk_mix.empty:
+            c1, c2 = st.columns(2)
+            with c1:
+                st.markdown("### 👥 Scans per User")
+                st.bar_chart(per_user.set_index('username'), color="#D4AF37")
+                st.markdown("### 🪙 Scans per Asset")
+                st.bar_chart(per_coin.set_index('coin'), color="#D4AF37")
+            with c2:
+                st.markdown("### 📅 Scans per Day")
+                per_day = get_scan_summary("day")
+                st.line_chart(per_day.assign(day=pd.to_datetime(per_day['day'])).set_index('day'), color="#B8860B")
+                st.markdown("### ⚖️ Risk Distribution")
+                st.bar_chart(risk_mix.set_index('risk_level'), color="#D4AF37")
+            st.markdown("### 📌 Latest Volatility per Asset")
+            st.dataframe(get_latest_vol(), use_container_width=True, hide_index=True)
+
+            st.markdown("### 🗂️ Records")
+            f1, f2, f3 = st.columns(3)
+            with f1: f_user = st.selectbox("User", ["All"] + per_user['username'].tolist())
+            with f2: f_coin = st.selectbox("Asset", ["All"] + per_coin['coin'].tolist())
+            with f3: f_risk = st.selectbox("Risk Level", ["All"] + risk_mix['risk_level'].tolist())
+            filters = {k: (None if v == "All" else v) for k, v in (("username", f_user), ("coin", f_coin), ("risk_level", f_risk))}
+            df, offset = history_pager("admin_pages", **filters)
+            df['No.'] = range(offset + 1, offset + len(df) + 1)
             cols = ['No.'] + [c for c in df.columns if c != 'No.']
             st.dataframe(df[cols], use_container_width=True, hide_index=True)
-            
+
             st.markdown("---")
             st.markdown("### ☣️ Admin Controls")
-            did = st.number_input("Purge ID (Use original DB ID)", step=1, min_value=0)
-            if st.button("🗑️ PURGE RECORD"):
-                delete_history_entry(did)
-                st.success(f"Entry {did} removed from database.")
-                st.rerun()
-
-
-
-
+            a1, a2, a3 = st.columns(3)
+            with a1:
+                did = st.number_input("Purge ID (Use original DB ID)", step=1, min_value=0)
+                if st.button("🗑️ PURGE RECORD"):
+                    delete_history_entry(did)
+                    st.success(f"Entry {did} removed from database.")
+                    st.rerun()
+            with a2:
+                lo = st.number_input("From ID", step=1, min_value=0)
+                hi = st.number_input("To ID", step=1, min_value=0)
+                if st.button("🗑️ PURGE ID RANGE"):
+                    st.success(f"{delete_history_range(lo, hi)} entries removed from database.")
+                    st.rerun()
+            with a3:
+                active = {k: v for k, v in filters.items() if v is not None}
+                st.caption("Filtered purge: " + (", ".join(f"{k}={v}" for k, v in active.items()) if active else "select a filter above"))
+                if st.button("🗑️ PURGE FILTERED", disabled=not active):
+                    st.success(f"{delete_history_where(**active)} entries removed from database.")
+                    st.rerun()
+        else: st.info("No analyses recorded yet.")
 
-                
\ No newline at end of file
+profiler.end_run(page=selected if st.session_state.auth else "hero")
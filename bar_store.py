@@ -0,0 +1,110 @@
+import os
+import re
+import threading
+import numpy as np
+import metrics
+
+# --- Append-Only Bar Store ---
+# One file per symbol of fixed-width 48-byte records (int64 epoch ns + float64 OHLCV), in
+# strictly increasing time order. Files are only ever appended to, so a reader that maps
+# the file sees a consistent prefix (a torn trailing record is ignored) and the record
+# count doubles as the data version. Reads memory-map the file and binary-search the time
+# column, so a range query touches only the pages it returns; resampling to coarser
+# resolutions is done on demand with reduceat over bucket boundaries.
+
+STORE_DIR = os.environ.get('VELOXIS_BAR_STORE', '.bar_store')
+BAR_DTYPE = np.dtype([('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'), ('volume', '<f8')])
+RESOLUTIONS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '4h': 14400, '1d': 86400}  # seconds per bar
+PERIODS_PER_YEAR = {r: 365 * 86400 // s for r, s in RESOLUTIONS.items()}
+_SYMBOL = re.compile(r'^[A-Za-z0-9_.\-]+$')
+
+_lock = threading.Lock()
+_last_time = {}  # symbol -> last appended epoch ns, so appends need not re-read the file
+
+def _path(symbol):
+    if not _SYMBOL.match(symbol): raise ValueError(f"Invalid symbol '{symbol}'")
+    return os.path.join(STORE_DIR, f'{symbol}.bars')
+
+def symbols():
+    try: return sorted(f[:-5] for f in os.listdir(STORE_DIR) if f.endswith('.bars'))
+    except OSError: return []
+
+def exists(symbol):
+    return _SYMBOL.match(symbol) is not None and os.path.exists(_path(symbol))
+
+def count(symbol):
+    try: return os.path.getsize(_path(symbol)) // BAR_DTYPE.itemsize
+    except OSError: return 0
+
+def version(symbol):
+    return count(symbol)
+
+def records(symbol):
+    # Whole history as a read-only memmap (nothing is read until it is indexed)
+    n = count(symbol)
+    if n == 0: return np.empty(0, dtype=BAR_DTYPE)
+    return np.memmap(_path(symbol), dtype=BAR_DTYPE, mode='r', shape=(n,))
+
+def read(symbol, start=None, end=None):
+    # Bars with start <= time < end (datetime64/str/epoch-ns bounds, None = open); still a memmap view
+    recs = records(symbol)
+    times = recs['time']
+    lo = 0 if start is None else int(np.searchsorted(times, _ns(start), 'left'))
+    hi = len(recs) if end is None else int(np.searchsorted(times, _ns(end), 'left'))
+    return recs[lo:hi]
+
+def _ns(t):
+    if isinstance(t, (int, np.integer)): return int(t)
+    return int(np.datetime64(t, 'ns').astype(np.int64))
+
+def append(symbol, bars):
+    # Appends bars (structured BAR_DTYPE array) newer than the stored tail; returns
+    # (written, ignored). Out-of-order or duplicate timestamps within the batch keep the last.
+    bars = np.asarray(bars, dtype=BAR_DTYPE)
+    path = _path(symbol)
+    with _lock:
+        if symbol not in _last_time:
+            recs = records(symbol)
+            _last_time[symbol] = int(recs['time'][-1]) if len(recs) else None
+        last = _last_time[symbol]
+        order = np.argsort(bars['time'], kind='stable')
+        bars = bars[order]
+        keep = np.append(bars['time'][1:] != bars['time'][:-1], True) if len(bars) else np.zeros(0, bool)
+        if last is not None: keep &= bars['time'] > last
+        fresh = bars[keep]
+        if len(fresh):
+            os.makedirs(STORE_DIR, exist_ok=True)
+            with open(path, 'ab') as f:
+                f.truncate(count(symbol) * BAR_DTYPE.itemsize)  # drop a torn record from a crashed write
+                f.write(fresh.tobytes())
+            _last_time[symbol] = int(fresh['time'][-1])
+    metrics.incr("bar_store.bars_written", len(fresh)); metrics.incr("bar_store.bars_ignored", len(bars) - len(fresh))
+    return len(fresh), len(bars) - len(fresh)
+
+def resample(bars, resolution):
+    # OHLCV aggregation into epoch-aligned buckets; bar time = bucket start
+    if resolution in (None, 'raw') or len(bars) == 0: return np.asarray(bars)
+    step = RESOLUTIONS[resolution] * 10**9
+    times = np.asarray(bars['time'])
+    bucket = times // step
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(times)] - 1
+    out = np.empty(len(starts), dtype=BAR_DTYPE)
+    out['time'] = bucket[starts] * step
+    out['open'] = np.asarray(bars['open'])[starts]
+    out['close'] = np.asarray(bars['close'])[ends]
+    out['high'] = np.maximum.reduceat(np.asarray(bars['high']), starts)
+    out['low'] = np.minimum.reduceat(np.asarray(bars['low']), starts)
+    out['volume'] = np.add.reduceat(np.asarray(bars['volume']), starts)
+    return out
+
+@metrics.timed("bar_store.load")
+def load(symbol, resolution='1d', start=None, end=None):
+    return resample(read(symbol, start, end), resolution)
+
+def make_bars(times, open_, high, low, close, volume=None):
+    bars = np.empty(len(times), dtype=BAR_DTYPE)
+    bars['time'] = np.asarray(times, dtype='datetime64[ns]').astype(np.int64)
+    bars['open'], bars['high'], bars['low'], bars['close'] = open_, high, low, close
+    bars['volume'] = 0.0 if volume is None else volume
+    return bars
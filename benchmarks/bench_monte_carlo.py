@@ -0,0 +1,51 @@
+import argparse
+import time
+import tracemalloc
+import numpy as np
+from montecarlo import simulate_paths, simulate_terminal
+
+# Compares the vectorized engine with the original per-step loop.
+# Run from the repo root: python -m benchmarks.bench_monte_carlo
+
+def legacy_run_monte_carlo(current_price, vol, days=30, sims=1000):
+    vol = max(vol, 0.01)
+    daily_vol = vol / np.sqrt(365)
+    results = np.zeros((days, sims))
+    for i in range(sims):
+        prices = [current_price]
+        for _ in range(days-1): prices.append(prices[-1] * (1 + np.random.normal(0, daily_vol)))
+        results[:, i] = prices
+    return results
+
+def _measure(fn, repeat):
+    best, peak = float('inf'), 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        t0 = time.perf_counter(); fn(); elapsed = time.perf_counter() - t0
+        peak = max(peak, tracemalloc.get_traced_memory()[1]); tracemalloc.stop()
+        best = min(best, elapsed)
+    return best, peak / 2**20
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, default=30)
+    ap.add_argument("--sims", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--legacy-max", type=int, default=10_000, help="skip the legacy loop above this many sims")
+    args = ap.parse_args()
+
+    print(f"{'sims':>9} {'engine':<22} {'best (s)':>10} {'peak MiB':>10} {'speedup':>9}")
+    for sims in args.sims:
+        cases = [("simulate_paths", lambda: simulate_paths(100.0, 0.6, args.days, sims, seed=1)),
+                 ("simulate_paths gbm", lambda: simulate_paths(100.0, 0.6, args.days, sims, seed=1, model='gbm')),
+                 ("simulate_terminal", lambda: simulate_terminal(100.0, 0.6, args.days, sims, seed=1, chunk_size=10_000))]
+        if sims <= args.legacy_max:
+            cases.insert(0, ("legacy loop", lambda: legacy_run_monte_carlo(100.0, 0.6, args.days, sims)))
+        ref = None
+        for name, fn in cases:
+            best, peak = _measure(fn, args.repeat)
+            ref = ref or best
+            print(f"{sims:>9} {name:<22} {best:>10.4f} {peak:>10.1f} {ref / best:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# --- Parity Checks ---
+# Fast numerical checks of the vectorized engines against plain reference implementations
+# (the per-asset pandas path, or a direct loop) on small seeded synthetic data, so a change
+# to an engine can be verified before it is benchmarked. Run from the repo root:
+#   python -m benchmarks.check                        # every check, a few seconds
+#   python -m benchmarks.check --check risk
+# Each line reports the worst error against its tolerance; any failure exits with status 1.
+
+WORKDIR = os.environ.get("VELOXIS_CHECK_DIR") or tempfile.mkdtemp(prefix="veloxis_check_")
+os.environ["VELOXIS_CHECK_DIR"] = WORKDIR  # spawned Monte Carlo pool workers re-import this module
+os.environ["VELOXIS_PRICE_CACHE"] = os.path.join(WORKDIR, "price_cache")
+os.environ["VELOXIS_REPORT_CACHE"] = os.path.join(WORKDIR, "report_cache")
+os.environ["VELOXIS_DB"] = os.path.join(WORKDIR, "check.db")
+os.environ["VELOXIS_MC_CACHE"] = os.path.join(WORKDIR, "mc_cache")
+os.environ["VELOXIS_BAR_STORE"] = os.path.join(WORKDIR, "bar_store")
+
+import logging
+import warnings
+warnings.filterwarnings("ignore")
+import numpy as np
+import pandas as pd
+import analysis
+import bar_store
+import database
+import divergence
+import history_writer
+import mc_cache
+import montecarlo
+import stress
+import vol_models
+import vol_state
+from risk_engine import compute_risk_metrics
+for name in ("streamlit.runtime.caching.cache_data_api", "streamlit.runtime.scriptrunner_utils.script_run_context"):
+    logging.getLogger(name).setLevel(logging.ERROR)  # "no runtime" noise when run outside streamlit
+
+SEED = 7
+
+def synthetic_closes(rows, n, seed=SEED):
+    # (rows x n) random-walk closes; asset j starts trading at row 20 * j (NaN before)
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.04, (rows, n)), axis=0))
+    for j in range(n): closes[:20 * j, j] = np.nan
+    return closes
+
+def synthetic_returns(rows, n, gaps=0.03, seed=SEED):
+    # (rows x n) daily returns with a share `gaps` of scattered missing values
+    rng = np.random.default_rng(seed)
+    r = rng.normal(0, 0.03, (rows, n)) * rng.uniform(0.5, 2.0, n)
+    r[rng.random((rows, n)) < gaps] = np.nan
+    return r
+
+def max_err(a, b):
+    # Worst absolute difference; NaN in exactly one of the two counts as infinite
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    if a.shape != b.shape or (np.isnan(a) != np.isnan(b)).any(): return float("inf")
+    both = ~np.isnan(a)
+    return float(np.max(np.abs(a[both] - b[both]), initial=0.0))
+
+def check_risk():
+    # risk_engine batch metrics vs the per-asset pandas path they replaced
+    closes = synthetic_closes(400, 6)
+    dates = pd.date_range("2020-01-01", periods=len(closes), freq="D")
+    m = compute_risk_metrics(closes, (30,))
+    vol_err = dd_err = 0.0
+    for j in range(closes.shape[1]):
+        df = analysis.price_frame(dates, closes[:, j])
+        rows = np.flatnonzero(np.isfinite(closes[:, j]))[2:]  # pandas fills the first two (one return) with 0
+        vol_err = max(vol_err, max_err(m["vol"][30][rows, j], df["vol_30d"].to_numpy()[2:]))
+        dd_err = max(dd_err, abs(m["max_drawdown"][j] - analysis.calculate_max_drawdown(df)))
+    yield "compute_risk_metrics vol_30d vs price_frame", vol_err, 1e-12
+    yield "compute_risk_metrics max_drawdown vs calculate_max_drawdown", dd_err, 1e-12
+
+def check_stress():
+    # Rolling historical VaR/CVaR vs pandas rolling sums/quantiles and a per-window loop
+    r = synthetic_returns(500, 4)
+    window, min_periods = 120, 60
+    for h in (1, 5):
+        hr = stress.horizon_returns(r, h)
+        ref_hr = np.expm1(pd.DataFrame(np.log1p(r)).rolling(h).sum().to_numpy())
+        yield f"horizon_returns h={h} vs pandas rolling sum", max_err(hr, ref_hr), 1e-12
+        out = stress.historical_var(r, window, h, min_periods=min_periods)
+        loss = pd.DataFrame(-hr).rolling(window, min_periods=min_periods)
+        for level in stress.LEVELS:
+            ref_var = loss.quantile(level).to_numpy().copy()
+            ref_var[:window - 1] = np.nan  # historical_var starts at the first full window
+            yield f"historical_var h={h} VaR {level} vs pandas rolling quantile", max_err(out["var"][level], ref_var), 1e-12
+            ref_cvar = np.full(r.shape, np.nan)
+            for t in range(window - 1, len(r)):
+                for j in range(r.shape[1]):
+                    w = -hr[t - window + 1:t + 1, j]; w = w[np.isfinite(w)]
+                    if len(w) >= min_periods: ref_cvar[t, j] = w[w >= np.quantile(w, level)].mean()
+            yield f"historical_var h={h} CVaR {level} vs per-window mean tail", max_err(out["cvar"][level], ref_cvar), 1e-12
+    # Block bootstrap vs compounding the same circular blocks row by row (same seed, same draws)
+    full = r[np.isfinite(r).all(axis=1)]
+    horizon, block, paths = 23, 5, 200
+    out = stress.block_bootstrap(r, horizon, paths, block, seed=SEED)
+    rng = np.random.default_rng(SEED)
+    starts = rng.integers(0, len(full), size=(paths, horizon // block))
+    tail = rng.integers(0, len(full), size=paths)
+    ref = np.empty_like(out)
+    for p in range(paths):
+        rows = [(s + k) % len(full) for s in starts[p] for k in range(block)] + [(tail[p] + k) % len(full) for k in range(horizon % block)]
+        ref[p] = np.prod(1 + full[rows], axis=0) - 1
+    yield "block_bootstrap vs per-path compounding", max_err(out, ref), 1e-12
+
+def _summary_rows():
+    with database.get_connection() as conn:
+        return {t: set(conn.execute(f"SELECT * FROM {t}").fetchall()) for t in database.SUMMARY_TABLES}
+
+def _summary_mismatch():
+    # Rows that differ between the trigger-maintained summaries and a rebuild from history
+    before = _summary_rows()
+    database.rebuild_summaries()
+    after = _summary_rows()
+    return sum(len(before[t] ^ after[t]) for t in before)
+
+def check_database():
+    # Summary tables kept by the history triggers vs rebuild_summaries, after every kind of write
+    from datetime import datetime, timedelta
+    database.init_db()
+    rng = np.random.default_rng(SEED)
+    users, coins, levels = ["alice", "bob", "carol"], ["Bitcoin", "Ethereum", "Tether", "Solana"], ["STABLE", "MODERATE", "CRITICAL", None]
+    t0 = datetime(2024, 1, 1)
+    database.save_history_many([(users[rng.integers(3)], coins[rng.integers(4)], levels[rng.integers(4)], float(rng.random()),
+                                 t0 + timedelta(hours=int(h)), "check") for h in np.sort(rng.integers(0, 24 * 30, 2000))])
+    yield "summaries after bulk insert", _summary_mismatch(), 0
+    with database.get_connection() as conn:
+        latest = [r[0] for r in conn.execute("SELECT id FROM coin_latest")]
+    for i in latest + [5, 17, 1999]: database.delete_history_entry(i)
+    yield "summaries after single deletes (incl. each coin's latest)", _summary_mismatch(), 0
+    database.delete_history_range(100, 400, username="bob"); database.delete_history_range(1500, 2000)
+    yield "summaries after range deletes", _summary_mismatch(), 0
+    database.delete_history_where(coin="Tether", risk_level="CRITICAL"); database.purge_user_history("carol")
+    yield "summaries after filtered delete and purge", _summary_mismatch(), 0
+    with database.get_connection() as conn:
+        total, scans = conn.execute("SELECT (SELECT COUNT(*) FROM history), (SELECT SUM(scans) FROM history_daily)").fetchone()
+    yield "history_daily scans vs history row count", abs(total - scans), 0
+    database.close_pool()
+
+def _garch_loglik(x, alpha, beta, var0):
+    # Direct Gaussian log-likelihood of one demeaned series (up to the constant) and the next variance
+    h, ll = var0, 0.0
+    for v in x:
+        if np.isfinite(v): ll -= 0.5 * (np.log(h) + v * v / h); h = var0 * (1 - alpha - beta) + alpha * v * v + beta * h
+    return ll, h
+
+def check_vol_models():
+    r = synthetic_returns(400, 5)
+    # Range estimators vs pandas rolling means of the per-bar variance terms
+    rng = np.random.default_rng(SEED)
+    close = 100 * np.exp(np.nancumsum(r, axis=0)); open_ = close * np.exp(rng.normal(0, 0.01, r.shape))
+    high, low = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.02, r.shape))), np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.02, r.shape)))
+    hl, co = np.log(high / low), np.log(close / open_)
+    mean = lambda x: pd.DataFrame(x).rolling(vol_models.RANGE_WINDOW, min_periods=1).mean().to_numpy()
+    yield "parkinson_vol vs pandas rolling mean", max_err(vol_models.parkinson_vol(high, low), np.sqrt(mean(hl * hl) / (4 * np.log(2)) * 365)), 1e-12
+    gk = np.sqrt(np.maximum(mean(0.5 * hl * hl - (2 * np.log(2) - 1) * co * co), 0) * 365)
+    yield "garman_klass_vol vs pandas rolling mean", max_err(vol_models.garman_klass_vol(open_, high, low, close), gk), 1e-12
+
+    # Vectorized GARCH recursion vs a direct per-asset loop, NaN gaps included
+    mu, var0, _ = vol_models._moments(r)
+    x = r - mu
+    alpha, beta = np.array([[0.05], [0.12], [0.3]]), np.array([[0.9], [0.8], [0.1]])
+    ll, h_next, _ = vol_models.garch_filter(x, alpha, beta, var0)
+    ref = np.array([[_garch_loglik(x[:, j], a[0], b[0], var0[j]) for j in range(x.shape[1])] for a, b in zip(alpha, beta)])
+    yield "garch_filter log-likelihood vs per-asset loop", float(np.max(np.abs(ll - ref[..., 0]) / np.abs(ref[..., 0]))), 1e-10
+    yield "garch_filter next variance vs per-asset loop", float(np.max(np.abs(h_next - ref[..., 1]) / ref[..., 1])), 1e-10
+
+    # garch_fit vs a dense brute-force search over the whole persistence range
+    fit = vol_models.garch_fit(r)
+    p_axis = np.r_[np.linspace(0.0, 0.99, 100), 0.995, 0.999]
+    pp, ss = (a.ravel()[:, None] for a in np.meshgrid(p_axis, np.linspace(0.0, 1.0, 51)))
+    ll, _, _ = vol_models.garch_filter(x, ss * pp, (1 - ss) * pp, var0)
+    # near-iid series leave a flat ridge in (persistence, alpha); a few tenths of a log-lik unit is noise
+    yield "garch_fit log-likelihood shortfall vs brute force", float(np.max(ll.max(axis=0) - fit["loglik"])), 0.25
+    ref = np.array([_garch_loglik(x[:, j], fit["alpha"][j], fit["beta"][j], var0[j])[0] for j in range(x.shape[1])])
+    yield "garch_fit reported log-likelihood vs per-asset loop", float(np.max(np.abs(fit["loglik"] - ref) / np.abs(ref))), 1e-10
+
+def check_divergence():
+    # Incremental window moments vs pandas pairwise rolling corr / std, NaN gaps included
+    r = synthetic_returns(300, 6, gaps=0.1)
+    window, min_periods = 60, 30
+    ends = list(range(window - 1, len(r), 7)) + [len(r) - 1]
+    corr, vol = divergence.rolling_corr(r, window, ends, min_periods)
+    df = pd.DataFrame(r)
+    roll = df.rolling(window, min_periods=min_periods)
+    ref_corr = roll.corr().to_numpy().reshape(len(r), r.shape[1], r.shape[1])[ends]
+    yield "rolling_corr vs pandas rolling corr", max_err(corr, ref_corr), 1e-12
+    yield "rolling_corr vols vs pandas rolling std", max_err(vol, (roll.std() * np.sqrt(365)).to_numpy()[ends]), 1e-12
+    iu = np.triu_indices(r.shape[1], 1)
+    ref_avg = [np.nanmean(c[iu]) if np.isfinite(c[iu]).any() else np.nan for c in ref_corr]
+    yield "average_corr vs mean of pandas upper triangle", max_err(divergence.average_corr(r, window, ends, min_periods), ref_avg), 1e-12
+
+def check_portfolio():
+    # Assets too short for the covariance are skipped one at a time, not the whole portfolio
+    closes = synthetic_closes(400, 3)
+    closes[:-21, 2] = np.nan  # 20 returns, under covariance's min_periods
+    dates = pd.date_range("2020-01-01", periods=len(closes), freq="D").to_numpy()
+    ids = ["check-a", "check-b", "check-c"]
+    close_matrix, analysis.get_close_matrix = analysis.get_close_matrix, lambda coin_ids: (dates, closes, list(coin_ids))
+    try:
+        kept, cov = analysis.get_return_covariance(tuple(ids))
+        out = analysis.run_portfolio_monte_carlo(dict.fromkeys(ids, 1 / 3), days=10, sims=200, seed=SEED)
+    finally: analysis.get_close_matrix = close_matrix
+    returns = analysis.simple_returns(closes[-366:, :2])[1:]  # the default 365-row lookback
+    yield "get_return_covariance drops only the short asset", float(kept != ids[:2]), 0
+    yield "get_return_covariance kept block vs np.cov", max_err(cov, np.cov(returns[np.isfinite(returns).all(axis=1)], rowvar=False)), 1e-12
+    yield "run_portfolio_monte_carlo reports the short asset skipped", float(out is None or out["skipped"] != ids[2:]), 0
+
+def _vol_state_errors(key, state, times, prices):
+    # Tail vol_30d and the final state vs a full pandas recompute over source + tail
+    tail = vol_state.read_tail(key)
+    ref = analysis.price_frame(np.r_[times, tail["time"].to_numpy()], np.r_[prices, tail["price"].to_numpy()])
+    full = vol_state.VolState.from_series(ref["time"], ref["price"])
+    return (max_err(tail["vol_30d"], ref["vol_30d"].to_numpy()[len(times):]),
+            max(abs(state.vol - full.vol), abs(state.max_drawdown - full.max_drawdown), abs(state.last_price - full.last_price),
+                abs(state.max_drawdown - analysis.calculate_max_drawdown(ref))))
+
+def check_vol_state():
+    # Incremental appends, and the rebuild a backfill triggers, vs recomputing from scratch
+    closes = synthetic_closes(360, 1)[:, 0]
+    times = pd.date_range("2020-01-01", periods=len(closes), freq="D").to_numpy()
+    src_t, src_p, bars = times[:300], closes[:300], list(zip(times[300:], closes[300:]))
+    for chunk in (bars[:20], bars[20:45], bars[45:]):
+        state, _ = vol_state.append_bars("check", chunk, src_t, src_p, "v1")
+    tail_err, state_err = _vol_state_errors("check", state, src_t, src_p)
+    yield "vol_state appended tail vol_30d vs price_frame", tail_err, 1e-12
+    yield "vol_state appended state vs full replay", state_err, 1e-12
+    # Backfill: one re-priced bar and one new bar between two existing ones
+    state, counts = vol_state.append_bars("check", [(times[310], closes[310] * 0.9), (times[320] + np.timedelta64(12, "h"), closes[320])], src_t, src_p, "v1")
+    tail_err, state_err = _vol_state_errors("check", state, src_t, src_p)
+    yield "vol_state backfill triggers a rebuild", abs(counts["backfilled"] - 2) + abs(len(vol_state.read_tail("check")) - 61), 0
+    yield "vol_state rebuilt tail vol_30d vs price_frame", tail_err, 1e-12
+    yield "vol_state rebuilt state vs full replay", state_err, 1e-12
+    yield "vol_state temp files left in the state dir", len([f for f in os.listdir(vol_state.STATE_DIR) if f.endswith(".tmp")]), 0
+
+def check_montecarlo():
+    # Seeded runs repeat exactly, the block-drawn paths match the original per-step loop, and
+    # the portfolio result does not depend on whether chunks run in-process or on the pool
+    price, vol, days, sims = 100.0, 0.8, 30, 500
+    for model in montecarlo.MODELS:
+        a, b = (montecarlo.simulate_paths(price, vol, days, sims, seed=SEED, model=model) for _ in range(2))
+        yield f"simulate_paths {model} same seed twice", max_err(a, b), 0
+    rng, dv = np.random.default_rng(SEED), montecarlo._daily_vol(vol)
+    ref = np.empty((days, sims)); ref[0] = price
+    for t in range(1, days): ref[t] = ref[t - 1] * (1 + rng.normal(0, dv, sims))
+    ref_err = max_err(montecarlo.simulate_paths(price, vol, days, sims, seed=SEED), ref) / price
+    yield "simulate_paths arithmetic vs per-step loop (relative)", ref_err, 1e-12
+    a, b = (montecarlo.simulate_terminal(price, vol, days, 2500, seed=SEED, chunk_size=1000)["terminal"] for _ in range(2))
+    yield "simulate_terminal chunked, same seed twice", max_err(a, b), 0
+    cov = np.cov(synthetic_returns(200, 4, gaps=0), rowvar=False)
+    run = lambda workers: montecarlo.simulate_portfolio(cov, [0.4, 0.3, 0.2, 0.1], days, 2000, seed=SEED, chunk_size=500, workers=workers)
+    serial, again, pooled = run(1), run(1), run(2)
+    yield "simulate_portfolio same seed twice", max_err(serial["terminal"], again["terminal"]), 0
+    yield "simulate_portfolio pooled vs serial terminal values", max_err(pooled["terminal"], serial["terminal"]), 0
+    yield "simulate_portfolio pooled vs serial bands", max(max_err(pooled["bands"][p], serial["bands"][p]) for p in serial["bands"]), 0
+
+def check_mc_cache():
+    # A summary served from memory or from its .npz file equals a freshly computed one
+    key, calls = ("check", 100.0, 0.8, 30, 500, SEED), []
+    def compute():
+        calls.append(1)
+        return mc_cache.summarize(montecarlo.simulate_paths(*key[1:5], seed=SEED))
+    fresh = compute()
+    summary_err = lambda s: max(max_err(s[k], fresh[k]) for k in fresh) if s is not None and s.keys() == fresh.keys() else float("inf")
+    first = mc_cache.get_or_compute(key, compute)
+    yield "mc_cache miss vs fresh summary", summary_err(first), 0
+    yield "mc_cache memory hit vs fresh summary", summary_err(mc_cache.get_or_compute(key, compute)), 0
+    mc_cache.store.clear()  # memory only: the next lookup reads the .npz
+    yield "mc_cache disk hit vs fresh summary", summary_err(mc_cache.get_or_compute(key, compute)), 0
+    yield "mc_cache computations beyond the first miss", len(calls) - 2, 0
+
+def _bar_array(bars):
+    return np.column_stack([np.asarray(bars[f], dtype=np.float64) for f in bar_store.BAR_DTYPE.names])
+
+def check_bar_store():
+    # Appends keep strictly increasing times (last duplicate wins, stale bars ignored, a torn
+    # trailing record cut off), and resample matches pandas OHLCV aggregation
+    rng = np.random.default_rng(SEED)
+    minutes = np.sort(rng.choice(3 * 24 * 60, 2000, replace=False))  # 1m bars with gaps over 3 days
+    times = np.datetime64("2024-01-01T00:00", "ns") + minutes * np.timedelta64(60, "s")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, len(times))))
+    open_ = np.r_[100.0, close[:-1]]
+    high, low = np.maximum(open_, close) * 1.001, np.minimum(open_, close) * 0.999
+    bars = bar_store.make_bars(times, open_, high, low, close, rng.integers(1, 100, len(times)))
+
+    batch = np.concatenate([bars[:1000][::-1], bars[500:510]])  # reversed, then 10 re-sent rows
+    batch["close"][-10:] += 1.0
+    written, ignored = bar_store.append("check", batch)
+    ref = bars[:1000].copy(); ref["close"][500:510] += 1.0
+    yield "bar_store append: reversed batch with duplicates, last wins", max_err(_bar_array(bar_store.records("check")), _bar_array(ref)), 0
+    yield "bar_store append: written/ignored counts", abs(written - 1000) + abs(ignored - 10), 0
+    with open(bar_store._path("check"), "ab") as f: f.write(bars[1000:1001].tobytes()[:20])  # a crashed write
+    written, ignored = bar_store.append("check", bars[900:])  # overlaps the stored tail
+    ref = np.concatenate([ref, bars[1000:]])
+    yield "bar_store append: stale overlap ignored, torn record truncated", max_err(_bar_array(bar_store.records("check")), _bar_array(ref)), 0
+    yield "bar_store append: overlap written/ignored counts", abs(written - 1000) + abs(ignored - 100), 0
+
+    df = pd.DataFrame(_bar_array(ref)[:, 1:], columns=bar_store.BAR_DTYPE.names[1:], index=pd.DatetimeIndex(ref["time"].view("datetime64[ns]")))
+    agg = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+    for resolution, rule in (("5m", "5min"), ("1h", "1h"), ("1d", "1D")):
+        out = bar_store.load("check", resolution)
+        exp = df.resample(rule).agg(agg).dropna()
+        exp = np.column_stack([exp.index.to_numpy(dtype="datetime64[ns]").astype(np.int64), exp.to_numpy()])
+        yield f"bar_store resample {resolution} vs pandas resample().agg", max_err(_bar_array(out), exp), 0
+    try: analysis.get_data("bitcoin", "1h"); refused = 0
+    except ValueError: refused = 1
+    yield "get_data refuses intraday resolutions for a csv-only asset", 1 - refused, 0
+
+def _history_notes(prefix):
+    with database.get_connection() as conn:
+        return [r[0] for r in conn.execute("SELECT note FROM history WHERE note LIKE ?", (prefix + "%",))]
+
+def check_history_writer():
+    # Write-behind batches survive a failing save_history_many: transient errors are retried,
+    # a batch that keeps failing is written row by row and only the refused row is lost
+    database.init_db()
+    save_many, calls = database.save_history_many, {"n": 0}
+    def flaky(rows):  # the first two attempts fail, like a briefly locked database
+        calls["n"] += 1
+        if calls["n"] <= 2: raise RuntimeError("database is locked")
+        save_many(rows)
+    def broken(rows):  # every multi-row batch fails, and so does one row on its own
+        if len(rows) > 1 or rows[0][5] == "wb-permanent-3": raise RuntimeError("disk I/O error")
+        save_many(rows)
+    try:
+        for name, fake, lost in (("transient", flaky, 0), ("permanent", broken, 1)):
+            database.save_history_many = fake
+            writer = history_writer.HistoryWriter(batch_size=50, flush_interval_ms=20, retry_backoff_ms=1).start()
+            for i in range(10): writer.submit("check", "Bitcoin", "STABLE", 0.5, f"wb-{name}-{i}")
+            writer.flush(timeout=10); writer.stop()
+            written, c = len(_history_notes(f"wb-{name}-")), writer.counters()
+            yield f"write-behind {name} failure: rows lost", abs(10 - written - lost), 0
+            yield f"write-behind {name} failure: written/failed counters", abs(c["written"] - written) + abs(c["failed"] - lost), 0
+    finally: database.save_history_many = save_many
+    database.close_pool()
+
+CHECKS = {"risk": check_risk, "stress": check_stress, "database": check_database, "vol_models": check_vol_models,
+          "divergence": check_divergence, "portfolio": check_portfolio,
+          "vol_state": check_vol_state, "history": check_history_writer,
+          "montecarlo": check_montecarlo, "mc_cache": check_mc_cache,
+          "bar_store": check_bar_store}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--check", choices=CHECKS, nargs="+", default=list(CHECKS))
+    args = ap.parse_args()
+    failures = 0
+    try:
+        for name in args.check:
+            t0 = time.perf_counter()
+            for case, err, tol in CHECKS[name]():
+                ok = err <= tol
+                failures += not ok
+                print(f"{name:<12} {case:<64} err {err:>10.3g}  tol {tol:<8.3g} {'ok' if ok else 'FAIL'}", flush=True)
+            print(f"{name:<12} done in {time.perf_counter() - t0:.2f}s")
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+    print(f"\n{failures} failure(s)")
+    if failures: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# --- Benchmark Harness ---
+# Times the hot paths over parameterized sizes using synthetic data generated into a temp
+# directory, writes the results as JSON and optionally compares them against a stored
+# baseline. Run from the repo root:
+#   python -m benchmarks.run                          # quick profile, print table
+#   python -m benchmarks.run --profile full --out results.json
+#   python -m benchmarks.run --compare benchmarks/baseline.json --threshold 0.25
+#   python -m benchmarks.run --save-baseline          # overwrite benchmarks/baseline.json
+#   python -m benchmarks.run --add-to-baseline        # append only cases the baseline lacks
+# A case regresses when its median exceeds baseline median * (1 + threshold) and is also
+# at least --min-ms slower (sub-millisecond cases are noise); any regression makes the
+# process exit with status 1.
+
+PROFILES = {
+    "quick": {"assets": [5, 20], "years": [1, 5], "sims": [1000, 100_000], "horizons": [30], "history_rows": [10_000], "repeat": 3},
+    "full": {"assets": [5, 50, 200], "years": [1, 5, 20], "sims": [1000, 100_000, 1_000_000], "horizons": [30, 90],
+             "history_rows": [10_000, 100_000, 1_000_000], "repeat": 5},
+}
+FIELDS = ("Close", "High", "Low", "Open", "Volume")
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+WORKDIR = tempfile.mkdtemp(prefix="veloxis_bench_")
+os.environ["VELOXIS_PRICE_CACHE"] = os.path.join(WORKDIR, "price_cache")
+os.environ["VELOXIS_REPORT_CACHE"] = os.path.join(WORKDIR, "report_cache")
+os.environ["VELOXIS_DB"] = os.path.join(WORKDIR, "bench.db")
+
+import logging
+import warnings
+warnings.filterwarnings("ignore")
+import numpy as np
+import pandas as pd
+import analysis
+import database
+import divergence
+import price_store
+import stress
+import vol_models
+from montecarlo import simulate_portfolio, simulate_terminal
+from risk_engine import compute_risk_metrics
+for name in ("streamlit.runtime.caching.cache_data_api", "streamlit.runtime.scriptrunner_utils.script_run_context"):
+    logging.getLogger(name).setLevel(logging.ERROR)  # "no runtime" noise when run outside streamlit
+
+def synthetic_csv(n_assets, years, seed=0):
+    # Same wide layout as the cleaned_* files: Date, then n_assets columns per field
+    path = os.path.join(WORKDIR, f"synthetic_{n_assets}x{years}y.csv")
+    if os.path.exists(path): return path
+    rng = np.random.default_rng(seed)
+    days = 365 * years
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.04, (days, n_assets)), axis=0))
+    spread = np.abs(rng.normal(0, 0.02, (days, n_assets)))
+    blocks = {"Close": close, "High": close * (1 + spread), "Low": close * (1 - spread),
+              "Open": close * (1 + rng.normal(0, 0.01, (days, n_assets))), "Volume": rng.integers(1e6, 1e9, (days, n_assets)).astype(float)}
+    df = pd.DataFrame(np.hstack([blocks[f] for f in FIELDS]), columns=[f for f in FIELDS for _ in range(n_assets)])
+    df.insert(0, "Date", pd.date_range("2005-01-01", periods=days, freq="D").strftime("%Y-%m-%d"))
+    df.to_csv(path, index=False)
+    return path
+
+def register_assets(path, n_assets):
+    # Point synthetic coin ids at the synthetic file so get_data exercises its real path
+    labels = ["Close"] + [f"Close.{i}" for i in range(1, n_assets)]
+    ids = []
+    for i, label in enumerate(labels):
+        cid = f"bench-{os.path.basename(path)}-{i}"
+        analysis.FILE_MAP[cid], analysis.COL_MAP[cid] = path, label
+        ids.append(cid)
+    return ids
+
+def measure(fn, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup: setup()
+        t0 = time.perf_counter(); fn(); samples.append((time.perf_counter() - t0) * 1000)
+    return {"best_ms": min(samples), "median_ms": statistics.median(samples), "repeat": repeat}
+
+def bench_data_load(p):
+    for n in p["assets"]:
+        for y in p["years"]:
+            path = synthetic_csv(n, y)
+            ids = register_assets(path, n)
+            params = {"assets": n, "years": y}
+            def cold():
+                price_store.clear()
+            yield "price_store.load (cold)", params, measure(lambda: price_store.load(path), p["repeat"], setup=cold)
+            price_store.load(path)
+            yield "price_store.load (warm)", params, measure(lambda: price_store.load(path), p["repeat"])
+            def all_assets():
+                analysis._history_frame.clear()
+                for c in ids: analysis.get_data(c)
+            yield "get_data (all assets)", params, measure(all_assets, p["repeat"])
+            yield "legacy read_csv per asset", params, measure(lambda: [pd.read_csv(path) for _ in ids], max(1, p["repeat"] // 2))
+
+def bench_risk(p):
+    for n in p["assets"]:
+        for y in p["years"]:
+            ids = register_assets(synthetic_csv(n, y), n)
+            frames = [analysis.get_data(c) for c in ids]
+            _, closes, _ = analysis.get_close_matrix(ids)
+            params = {"assets": n, "years": y}
+            yield "calculate_max_drawdown (per asset)", params, measure(lambda: [analysis.calculate_max_drawdown(f) for f in frames], p["repeat"])
+            yield "compute_risk_metrics (batch)", params, measure(lambda: compute_risk_metrics(closes), p["repeat"])
+            returns = compute_risk_metrics(closes)["returns"][1:]
+            yield "stress.historical_var (365d, 10d)", params, measure(lambda: stress.historical_var(returns, 365, 10), p["repeat"])
+            yield "stress.block_bootstrap (5000 paths)", params, measure(lambda: stress.block_bootstrap(returns[-365:], 10, 5000, seed=1), p["repeat"])
+            _, ohlc, _ = analysis.get_ohlc_matrix(ids)
+            yield "vol_models range (parkinson + gk)", params, measure(lambda: (vol_models.parkinson_vol(ohlc["high"], ohlc["low"]), vol_models.garman_klass_vol(ohlc["open"], ohlc["high"], ohlc["low"], ohlc["close"])), p["repeat"])
+            yield "vol_models.garch_fit", params, measure(lambda: vol_models.garch_fit(returns), p["repeat"])
+            yield "divergence.rolling_corr (90d, latest)", params, measure(lambda: divergence.rolling_corr(returns, 90), p["repeat"])
+            yield "divergence.average_corr (90d, weekly 1y)", params, measure(lambda: divergence.average_corr(returns, 90, range(max(len(returns) - 365, 0), len(returns), 7)), p["repeat"])
+
+def bench_monte_carlo(p):
+    for sims in p["sims"]:
+        for days in p["horizons"]:
+            params = {"sims": sims, "horizon": days}
+            if sims * days <= 10_000_000:
+                yield "run_monte_carlo", params, measure(lambda: analysis.run_monte_carlo(100.0, 0.6, days, sims, seed=1), p["repeat"])
+            yield "simulate_terminal (chunked)", params, measure(lambda: simulate_terminal(100.0, 0.6, days, sims, seed=1), p["repeat"])
+            for n in p["assets"]:
+                if sims * days * n > 100_000_000: continue
+                a = np.random.default_rng(n).normal(size=(n, n)); cov = a @ a.T / n * 1e-3
+                yield "simulate_portfolio", {**params, "assets": n}, measure(lambda: simulate_portfolio(cov, np.ones(n), days, sims, seed=1), p["repeat"])
+
+def bench_report(p):
+    comparison = {f"Asset {i}": 0.1 * i for i in range(10)}
+    for y in p["years"]:
+        df = analysis.get_data(register_assets(synthetic_csv(1, y), 1)[0])
+        params = {"years": y}
+        yield "generate_pdf_report", params, measure(lambda: analysis.build_pdf_report("bench", "Asset", 100.0, 0.5, "MODERATE", df, comparison), p["repeat"])
+
+def bench_database(p):
+    for rows in p["history_rows"]:
+        if os.path.exists(database.DB_PATH):
+            database.close_pool(); os.remove(database.DB_PATH)
+        database.init_db()
+        users = [f"user{i}" for i in range(100)]
+        rng = np.random.default_rng(0)
+        start = datetime(2025, 1, 1)
+        batch = [(users[i % 100], "Bitcoin", "STABLE", float(rng.random()), start + timedelta(seconds=i), "bench") for i in range(rows)]
+        database.save_history_many(batch)
+        params = {"history_rows": rows}
+        yield "save_history", params, measure(lambda: database.save_history("user0", "Bitcoin", "STABLE", 0.1), p["repeat"])
+        yield "get_user_history (page)", params, measure(lambda: database.get_user_history("user7", 50, 0), p["repeat"])
+        yield "count_user_history", params, measure(lambda: database.count_user_history("user7"), p["repeat"])
+        yield "get_system_stats", params, measure(database.get_system_stats, p["repeat"])
+        yield "get_history_page (keyset, deep)", params, measure(lambda: database.get_history_page(rows // 2, 50, username="user7"), p["repeat"])
+        yield "get_scan_summary (per day)", params, measure(lambda: database.get_scan_summary("day"), p["repeat"])
+        yield "get_admin_data (full table)", params, measure(database.get_admin_data, p["repeat"])
+
+SUITES = {"data_load": bench_data_load, "risk": bench_risk, "monte_carlo": bench_monte_carlo, "report": bench_report, "database": bench_database}
+
+def case_id(r):
+    return r["case"] + "|" + ",".join(f"{k}={v}" for k, v in sorted(r["params"].items()))
+
+def compare(results, baseline, threshold, min_ms):
+    base = {case_id(r): r for r in baseline["results"]}
+    rows, regressions = [], 0
+    for r in results:
+        b = base.get(case_id(r))
+        if b is None: continue
+        ratio = r["median_ms"] / b["median_ms"] if b["median_ms"] else float("inf")
+        regressed = ratio > 1 + threshold and r["median_ms"] - b["median_ms"] >= min_ms
+        regressions += regressed
+        rows.append((case_id(r), b["median_ms"], r["median_ms"], ratio, "REGRESSION" if regressed else ""))
+    return rows, regressions
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--profile", choices=PROFILES, default="quick")
+    ap.add_argument("--suite", choices=SUITES, nargs="+", default=list(SUITES))
+    ap.add_argument("--out", help="write results JSON here")
+    ap.add_argument("--compare", metavar="BASELINE", help="baseline JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline median (0.25 = +25%%)")
+    ap.add_argument("--min-ms", type=float, default=1.0, help="ignore slowdowns smaller than this many ms")
+    ap.add_argument("--save-baseline", action="store_true", help=f"write results to {BASELINE}")
+    ap.add_argument("--add-to-baseline", action="store_true", help=f"append cases missing from {BASELINE}, keeping existing numbers")
+    args = ap.parse_args()
+
+    p = PROFILES[args.profile]
+    results = []
+    try:
+        for suite in args.suite:
+            for case, params, stats in SUITES[suite](p):
+                results.append({"suite": suite, "case": case, "params": params, **{k: round(v, 4) for k, v in stats.items()}})
+                print(f"{suite:<12} {case:<36} {json.dumps(params):<36} median {stats['median_ms']:>10.2f} ms  best {stats['best_ms']:>10.2f} ms", flush=True)
+    finally:
+        database.close_pool()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    doc = {"profile": args.profile, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+           "env": {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+                   "machine": platform.machine(), "system": platform.system(), "cpus": os.cpu_count()},
+           "results": results}
+    for path in filter(None, [args.out, BASELINE if args.save_baseline else None]):
+        with open(path, "w") as f: json.dump(doc, f, indent=1)
+        print(f"wrote {path}")
+    if args.add_to_baseline:
+        # Feature work adds its new cases here; re-baselining existing ones is a separate, explained change
+        with open(BASELINE) as f: base = json.load(f)
+        known = {case_id(r) for r in base["results"]}
+        new = [r for r in results if case_id(r) not in known]
+        base["results"] += new
+        with open(BASELINE, "w") as f: json.dump(base, f, indent=1)
+        print(f"added {len(new)} case(s) to {BASELINE}")
+
+    if args.compare:
+        with open(args.compare) as f: baseline = json.load(f)
+        rows, regressions = compare(results, baseline, args.threshold, args.min_ms)
+        print(f"\n{'case':<80} {'base ms':>10} {'now ms':>10} {'ratio':>7}")
+        for cid, b, n, ratio, flag in rows: print(f"{cid:<80} {b:>10.2f} {n:>10.2f} {ratio:>6.2f}x {flag}")
+        print(f"\n{regressions} regression(s) over +{args.threshold:.0%}")
+        if regressions: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
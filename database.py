@@ -1,78 +1,267 @@
+import os
+import queue
 import sqlite3
-import pandas as pd
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from metrics import timed, incr
 
-def init_db():
-    conn = sqlite3.connect('crypto_saas.db')
-    c = conn.cursor()
-    # Create Users Table
-    c.execute('''CREATE TABLE IF NOT EXISTS users 
-                 (username TEXT PRIMARY KEY, password TEXT)''')
-    # Create History Table with the added 'note' column
-    c.execute('''CREATE TABLE IF NOT EXISTS history 
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                  username TEXT, 
-                  coin TEXT, 
-                  risk_level TEXT, 
-                  volatility REAL, 
-                  timestamp DATETIME,
-                  note TEXT)''')
-    conn.commit()
-    conn.close()
+DB_PATH = os.environ.get('VELOXIS_DB', 'crypto_saas.db')
+POOL_SIZE = 4
 
-def add_user(username, password):
+# --- Connection Pool ---
+# Connections are opened once per process (up to POOL_SIZE, shared by Streamlit's script
+# threads) in WAL mode so readers never block the single writer.
+_pool = queue.LifoQueue()
+_pool_lock = threading.Lock()
+_opened = 0
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+@contextmanager
+def get_connection():
+    global _opened
+    try: conn = _pool.get_nowait()
+    except queue.Empty:
+        with _pool_lock:
+            conn = _connect() if _opened < POOL_SIZE else None
+            if conn is not None: _opened += 1
+        if conn is None: conn = _pool.get()
     try:
-        conn = sqlite3.connect('crypto_saas.db')
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        _pool.put(conn)
+
+def close_pool():
+    global _opened
+    with _pool_lock:
+        while True:
+            try: _pool.get_nowait().close()
+            except queue.Empty: break
+        _opened = 0
+
+@timed("db.init_db")
+def init_db():
+    with get_connection() as conn:
         c = conn.cursor()
-        c.execute("INSERT INTO users VALUES (?, ?)", (username, password))
+        # Create Users Table
+        c.execute('''CREATE TABLE IF NOT EXISTS users
+                     (username TEXT PRIMARY KEY, password TEXT)''')
+        # Create History Table with the added 'note' column
+        c.execute('''CREATE TABLE IF NOT EXISTS history
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      username TEXT,
+                      coin TEXT,
+                      risk_level TEXT,
+                      volatility REAL,
+                      timestamp DATETIME,
+                      note TEXT)''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_history_user_ts ON history (username, timestamp)")
+        # Keyset pages walk these newest-first (an index on a column is ordered by (column, id))
+        for col in ("username", "coin", "risk_level"):
+            c.execute(f"CREATE INDEX IF NOT EXISTS idx_history_{col}_id ON history ({col}, id)")
+        _init_summaries(c)
+        # Optional persisted metric snapshots (metrics.snapshot)
+        c.execute('''CREATE TABLE IF NOT EXISTS metrics
+                     (timestamp DATETIME, name TEXT, count INTEGER, p50_ms REAL, p95_ms REAL, p99_ms REAL)''')
         conn.commit()
+
+# --- Summary Tables ---
+# Aggregates the admin pages read are materialized next to history and kept current by
+# triggers on every insert and delete, so their cost follows the number of users, coins and
+# days rather than the number of rows. "Latest" means the highest id for the coin; deleting
+# it promotes the next one through idx_history_coin_id. History rows are never updated.
+SUMMARY_TABLES = {
+    "history_daily": "(username TEXT, coin TEXT, day TEXT, scans INTEGER, PRIMARY KEY (username, coin, day))",
+    "risk_counts": "(risk_level TEXT PRIMARY KEY, n INTEGER)",
+    "coin_latest": "(coin TEXT PRIMARY KEY, id INTEGER, volatility REAL, risk_level TEXT, timestamp DATETIME)",
+}
+SUMMARY_TRIGGERS = {
+    "history_summary_insert": """AFTER INSERT ON history BEGIN
+        INSERT INTO history_daily VALUES (NEW.username, NEW.coin, date(NEW.timestamp), 1)
+            ON CONFLICT (username, coin, day) DO UPDATE SET scans = scans + 1;
+        INSERT INTO risk_counts VALUES (IFNULL(NEW.risk_level, ''), 1) ON CONFLICT (risk_level) DO UPDATE SET n = n + 1;
+        INSERT INTO coin_latest VALUES (NEW.coin, NEW.id, NEW.volatility, NEW.risk_level, NEW.timestamp)
+            ON CONFLICT (coin) DO UPDATE SET id = excluded.id, volatility = excluded.volatility,
+            risk_level = excluded.risk_level, timestamp = excluded.timestamp WHERE excluded.id > coin_latest.id;
+    END""",
+    "history_summary_delete": """AFTER DELETE ON history BEGIN
+        UPDATE history_daily SET scans = scans - 1 WHERE username = OLD.username AND coin = OLD.coin AND day = date(OLD.timestamp);
+        DELETE FROM history_daily WHERE username = OLD.username AND coin = OLD.coin AND day = date(OLD.timestamp) AND scans <= 0;
+        UPDATE risk_counts SET n = n - 1 WHERE risk_level = IFNULL(OLD.risk_level, '');
+        DELETE FROM risk_counts WHERE risk_level = IFNULL(OLD.risk_level, '') AND n <= 0;
+    END""",
+    "history_latest_delete": """AFTER DELETE ON history WHEN OLD.id = (SELECT id FROM coin_latest WHERE coin = OLD.coin) BEGIN
+        DELETE FROM coin_latest WHERE coin = OLD.coin;
+        INSERT INTO coin_latest SELECT coin, id, volatility, risk_level, timestamp FROM history
+            WHERE coin = OLD.coin ORDER BY id DESC LIMIT 1;
+    END""",
+}
+
+def _init_summaries(c):
+    existing = {r[0] for r in c.execute("SELECT name FROM sqlite_master WHERE type='trigger'")}
+    for name, ddl in SUMMARY_TABLES.items(): c.execute(f"CREATE TABLE IF NOT EXISTS {name} {ddl}")
+    for name, body in SUMMARY_TRIGGERS.items(): c.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    if not existing.issuperset(SUMMARY_TRIGGERS): _rebuild_summaries(c)  # first run on an existing database
+
+def _rebuild_summaries(c):
+    for name in SUMMARY_TABLES: c.execute(f"DELETE FROM {name}")
+    c.execute("INSERT INTO history_daily SELECT username, coin, date(timestamp), COUNT(*) FROM history GROUP BY 1, 2, 3")
+    c.execute("INSERT INTO risk_counts SELECT IFNULL(risk_level, ''), COUNT(*) FROM history GROUP BY 1")
+    c.execute("""INSERT INTO coin_latest SELECT h.coin, h.id, h.volatility, h.risk_level, h.timestamp FROM history h
+                 JOIN (SELECT coin, MAX(id) AS id FROM history GROUP BY coin) m ON h.id = m.id""")
+
+@timed("db.rebuild_summaries")
+def rebuild_summaries():
+    # Recomputes every summary table from history (repair only; the triggers keep them current)
+    with get_connection() as conn:
+        _rebuild_summaries(conn.cursor())
+        conn.commit()
+
+@timed("db.add_user")
+def add_user(username, password):
+    try:
+        with get_connection() as conn:
+            conn.execute("INSERT INTO users VALUES (?, ?)", (username, password))
+            conn.commit()
         return True
     except:
         return False
-    finally:
-        conn.close()
 
+@timed("db.login_user")
 def login_user(username, password):
-    conn = sqlite3.connect('crypto_saas.db')
-    c = conn.cursor()
-    c.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
-    user = c.fetchone()
-    conn.close()
-    return user
-
-def save_history(username, coin, risk, vol, note=""):
-    conn = sqlite3.connect('crypto_saas.db')
-    c = conn.cursor()
-    c.execute("INSERT INTO history (username, coin, risk_level, volatility, timestamp, note) VALUES (?, ?, ?, ?, ?, ?)",
-              (username, coin, risk, vol, datetime.now(), note))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        return conn.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password)).fetchone()
 
+@timed("db.save_history")
+def save_history(username, coin, risk, vol, note="", background=False):
+    # background=True hands the row to the write-behind queue (history_writer) and returns at once
+    if background:
+        from history_writer import get_writer
+        return get_writer().submit(username, coin, risk, vol, note)
+    save_history_many([(username, coin, risk, vol, datetime.now(), note)])
+
+@timed("db.save_history_many")
+def save_history_many(rows):
+    # rows: (username, coin, risk_level, volatility, timestamp, note), written in one transaction
+    with get_connection() as conn:
+        cur = conn.executemany("INSERT INTO history (username, coin, risk_level, volatility, timestamp, note) VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+    incr("db.rows_written", cur.rowcount)
+
+@timed("db.get_admin_data")
 def get_admin_data():
-    conn = sqlite3.connect('crypto_saas.db')
-    df = pd.read_sql_query("SELECT * FROM history", conn)
-    conn.close()
-    return df
+    import pandas as pd
+    with get_connection() as conn:
+        return pd.read_sql_query("SELECT * FROM history", conn)
+
+@timed("db.get_user_history")
+def get_user_history(username, limit=50, offset=0):
+    import pandas as pd
+    # Served from idx_history_user_ts: cost follows this user's rows, not the table size
+    with get_connection() as conn:
+        return pd.read_sql_query("SELECT * FROM history WHERE username=? ORDER BY timestamp, id LIMIT ? OFFSET ?",
+                                 conn, params=(username, limit, offset))
+
+@timed("db.count_user_history")
+def count_user_history(username):
+    with get_connection() as conn:
+        return conn.execute("SELECT IFNULL(SUM(scans), 0) FROM history_daily WHERE username=?", (username,)).fetchone()[0]
+
+def _history_filter(username=None, coin=None, risk_level=None, since=None, until=None):
+    # WHERE clause + params for the optional row filters (since/until bound the timestamp)
+    clauses, params = [], []
+    for sql, value in (("username=?", username), ("coin=?", coin), ("risk_level=?", risk_level),
+                       ("timestamp>=?", since), ("timestamp<?", until)):
+        if value is not None: clauses.append(sql); params.append(value)
+    return " AND ".join(clauses) or "1", params
+
+@timed("db.get_history_page")
+def get_history_page(before_id=None, limit=50, **filters):
+    # Keyset page, newest first: the `limit` rows with id < before_id (None = from the top).
+    # The next page starts before the last id returned, so every page costs the same.
+    import pandas as pd
+    where, params = _history_filter(**filters)
+    if before_id is not None: where += " AND id<?"; params.append(int(before_id))
+    with get_connection() as conn:
+        return pd.read_sql_query(f"SELECT * FROM history WHERE {where} ORDER BY id DESC LIMIT ?", conn, params=params + [limit])
 
+@timed("db.get_scan_summary")
+def get_scan_summary(by="username", username=None):
+    # Scan counts grouped by "username", "coin" or "day" (optionally for one user), from history_daily
+    import pandas as pd
+    if by not in ("username", "coin", "day"): raise ValueError(f"Unknown grouping '{by}'")
+    where, params = _history_filter(username=username)
+    with get_connection() as conn:
+        return pd.read_sql_query(f"SELECT {by}, SUM(scans) AS scans FROM history_daily WHERE {where} GROUP BY {by} ORDER BY {by}",
+                                 conn, params=params)
+
+@timed("db.get_risk_distribution")
+def get_risk_distribution():
+    import pandas as pd
+    with get_connection() as conn:
+        return pd.read_sql_query("SELECT risk_level, n AS scans FROM risk_counts ORDER BY n DESC", conn)
+
+@timed("db.get_latest_vol")
+def get_latest_vol():
+    # Most recent recorded volatility per coin
+    import pandas as pd
+    with get_connection() as conn:
+        return pd.read_sql_query("SELECT coin, volatility, risk_level, timestamp, id FROM coin_latest ORDER BY coin", conn)
+
+@timed("db.delete_history_entry")
 def delete_history_entry(entry_id):
-    conn = sqlite3.connect('crypto_saas.db')
-    c = conn.cursor()
-    c.execute("DELETE FROM history WHERE id=?", (entry_id,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        conn.execute("DELETE FROM history WHERE id=?", (entry_id,))
+        conn.commit()
 
+@timed("db.delete_history_range")
+def delete_history_range(first_id, last_id, username=None):
+    # Deletes ids first_id..last_id inclusive (only username's rows if given); returns the count
+    where, params = _history_filter(username=username)
+    with get_connection() as conn:
+        cur = conn.execute(f"DELETE FROM history WHERE id BETWEEN ? AND ? AND {where}", [int(first_id), int(last_id)] + params)
+        conn.commit()
+    return cur.rowcount
+
+@timed("db.delete_history_where")
+def delete_history_where(**filters):
+    # Bulk delete by the get_history_page filters; at least one is required (see purge_all_history)
+    if all(v is None for v in filters.values()): raise ValueError("delete_history_where needs at least one filter")
+    where, params = _history_filter(**filters)
+    with get_connection() as conn:
+        cur = conn.execute(f"DELETE FROM history WHERE {where}", params)
+        conn.commit()
+    return cur.rowcount
+
+@timed("db.get_system_stats")
 def get_system_stats():
-    conn = sqlite3.connect('crypto_saas.db')
-    users = pd.read_sql_query("SELECT COUNT(*) as count FROM users", conn).iloc[0]['count']
-    analyses = pd.read_sql_query("SELECT COUNT(*) as count FROM history", conn).iloc[0]['count']
-    conn.close()
-    import os
-    db_size = os.path.getsize('crypto_saas.db') / 1024
+    with get_connection() as conn:
+        users, analyses = conn.execute("SELECT (SELECT COUNT(*) FROM users), (SELECT IFNULL(SUM(n), 0) FROM risk_counts)").fetchone()
+    # On-disk footprint: in WAL mode recent writes sit in the -wal file until a checkpoint
+    db_size = sum(os.path.getsize(p) for p in (DB_PATH, DB_PATH + '-wal') if os.path.exists(p)) / 1024
     return {"users": users, "analyses": analyses, "db_size": f"{db_size:.2f} KB"}
 
+@timed("db.purge_user_history")
+def purge_user_history(username):
+    with get_connection() as conn:
+        conn.execute("DELETE FROM history WHERE username=?", (username,))
+        conn.commit()
+
+@timed("db.purge_all_history")
 def purge_all_history():
-    conn = sqlite3.connect('crypto_saas.db')
-    c = conn.cursor()
-    c.execute("DELETE FROM history")
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    with get_connection() as conn:
+        conn.execute("DELETE FROM history")
+        conn.commit()
+
+def save_metrics(rows):
+    with get_connection() as conn:
+        conn.executemany("INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
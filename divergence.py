@@ -0,0 +1,95 @@
+import numpy as np
+import metrics
+from risk_engine import PERIODS
+
+# --- Pairwise Divergence Engine ---
+# Rolling correlation and volatility-spread matrices for N assets from a (dates x assets)
+# returns matrix, NaN = no return. Each pair uses only the rows where both assets have a
+# return (pairwise-complete, as in risk_engine.covariance). Window sums of the pairwise
+# moments are carried from one window end to the next by adding the rows that enter and
+# subtracting the rows that leave, as (rows x N)^T (rows x N) matrix products, so a whole
+# history of matrices costs O(dates x N^2) and no pair is ever looped over.
+
+MIN_PERIODS_FRACTION = 0.5  # share of the window a pair must overlap to get a correlation
+
+def _accumulate(acc, x, m, w):
+    # acc += pairwise sums over a block of rows weighted by w (+1 entering, -1 leaving the
+    # window): overlap count, sum_i, sum_i^2 (rows where j is valid), sum_i*j
+    wm, wx = m * w[:, None], x * w[:, None]
+    for k, (a, b) in enumerate(((m, wm), (x, wm), (x * x, wm), (x, wx))): acc[k] += a.T @ b
+
+def window_moments(returns, window, ends):
+    # Yields (end, moments) for each row index in the ascending `ends`; moments are the
+    # (4 x N x N) pairwise sums over rows end-window+1..end. The rows entering and leaving
+    # between two ends go through one signed update.
+    returns = np.asarray(returns, dtype=np.float64)
+    valid = np.isfinite(returns)
+    x, m = np.where(valid, returns, 0.0), valid.astype(np.float64)
+    acc = np.zeros((4, returns.shape[1], returns.shape[1]))
+    lo = hi = 0  # acc covers rows [lo, hi)
+    for end in ends:
+        new_lo, new_hi = max(end + 1 - window, 0), end + 1
+        if new_lo >= hi:  # no overlap with the previous window: start over
+            acc[...] = 0.0; rows, w = np.arange(new_lo, new_hi), np.ones(new_hi - new_lo)
+        else:
+            rows = np.r_[hi:max(new_hi, hi), lo:new_lo]
+            w = np.r_[np.ones(len(rows) - max(new_lo - lo, 0)), -np.ones(max(new_lo - lo, 0))]
+        if len(rows): _accumulate(acc, x[rows], m[rows], w)
+        lo, hi = new_lo, new_hi
+        yield end, acc
+
+def correlation(moments, min_periods=2):
+    n, s, ss, sxy = moments
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = n * sxy - s * s.T
+        var = n * ss - s * s  # asset i over the rows shared with j
+        corr = cov / np.sqrt(var * var.T)
+    return np.where(n >= max(min_periods, 2), np.clip(corr, -1.0, 1.0), np.nan)
+
+def volatility(moments, min_periods=2, periods=PERIODS):
+    # Annualized volatility of each asset over its own valid rows in the window (the diagonal)
+    n, s, ss = (np.diagonal(a) for a in moments[:3])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var = (ss - s * s / n) / (n - 1)
+    return np.where(n >= max(min_periods, 2), np.sqrt(np.maximum(var, 0.0) * periods), np.nan)
+
+def vol_spread(vol):
+    # spread[i, j] = vol_i - vol_j
+    return vol[:, None] - vol[None, :]
+
+def _min_periods(window, min_periods):
+    return min_periods or max(int(window * MIN_PERIODS_FRACTION), 2)
+
+@metrics.timed("divergence.rolling")
+def rolling_corr(returns, window, ends=None, min_periods=None, periods=PERIODS):
+    # Correlation matrices (len(ends) x N x N) and vols (len(ends) x N) for the windows ending
+    # at each row in `ends` (default: the last row)
+    ends = [len(returns) - 1] if ends is None else sorted(ends)
+    mp = _min_periods(window, min_periods)
+    out = [(correlation(mo, mp), volatility(mo, mp, periods)) for _, mo in window_moments(returns, window, ends)]
+    if not out: return np.empty((0,) + (returns.shape[1],) * 2), np.empty((0, returns.shape[1]))
+    corr, vol = zip(*out)
+    return np.array(corr), np.array(vol)
+
+@metrics.timed("divergence.average_corr")
+def average_corr(returns, window, ends, min_periods=None):
+    # Mean off-diagonal correlation per window end (market cohesion), from the upper triangle
+    # only and without keeping the matrices
+    mp = _min_periods(window, min_periods)
+    i, j = np.triu_indices(returns.shape[1], 1)
+    out = np.full(len(ends), np.nan)
+    for k, (_, (n, s, ss, sxy)) in enumerate(window_moments(returns, window, sorted(ends))):
+        nij, sij, sji = n[i, j], s[i, j], s[j, i]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            c = (nij * sxy[i, j] - sij * sji) / np.sqrt((nij * ss[i, j] - sij * sij) * (nij * ss[j, i] - sji * sji))
+        c = c[(nij >= mp) & np.isfinite(c)]
+        if len(c): out[k] = np.clip(c, -1.0, 1.0).mean()
+    return out
+
+def ranked_pairs(matrix, k=10, ascending=True):
+    # (i, j, value) for the k most extreme finite entries above the diagonal
+    i, j = np.triu_indices(matrix.shape[0], 1)
+    v = matrix[i, j]
+    keep = np.flatnonzero(np.isfinite(v))
+    order = keep[np.argsort(v[keep] if ascending else -v[keep], kind='stable')[:k]]
+    return list(zip(i[order].tolist(), j[order].tolist(), v[order].tolist()))
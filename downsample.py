@@ -0,0 +1,72 @@
+import numpy as np
+
+# --- Chart Downsampling ---
+# Shape-preserving reduction of long series before they are serialized to Plotly or drawn
+# by matplotlib. 'lttb' (Largest-Triangle-Three-Buckets) keeps the points that carry the
+# visual shape of a line; 'minmax' keeps each bucket's low and high, so spikes and the
+# price envelope survive exactly. Both return sorted row indices into the input, and both
+# always keep the first and last point. Series already under the target are left alone.
+
+METHODS = ('lttb', 'minmax')
+CHART_WIDTH_PX = 1200  # full-width Plotly chart in the wide layout
+PDF_WIDTH_PX = 10 * 100  # 10in report figure at the default 100 dpi
+
+def points_for_width(width_px, density=1.0, floor=100):
+    # Point budget for a chart `width_px` wide: `density` points per pixel, never below `floor`
+    return max(int(width_px * density), floor)
+
+DEFAULT_POINTS = points_for_width(CHART_WIDTH_PX)
+PDF_POINTS = points_for_width(PDF_WIDTH_PX)
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64): return x.astype('datetime64[ns]').view(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+def lttb_indices(x, y, n):
+    x, y = _as_float(x), np.asarray(y, dtype=np.float64)
+    size = len(y)
+    if n >= size or n < 3: return np.arange(size)
+    # n - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    out = np.empty(n, dtype=np.int64)
+    out[0], out[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else size
+        cx, cy = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()  # average of the next bucket
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+def minmax_indices(y, n):
+    y = np.asarray(y, dtype=np.float64)
+    size = len(y)
+    if n >= size or n < 4: return np.arange(size)
+    buckets = (n - 2) // 2
+    bucket = np.minimum((np.arange(1, size - 1) - 1) * buckets // (size - 2), buckets - 1)
+    # Within each bucket, rows sorted by value: the first is the min and the last the max
+    order = np.lexsort((y[1:-1], bucket))
+    starts = np.searchsorted(bucket[order], np.arange(buckets))
+    ends = np.append(starts[1:], len(order)) - 1
+    picked = np.concatenate(([0], order[starts] + 1, order[ends] + 1, [size - 1]))
+    return np.unique(picked)
+
+def downsample(x, y, n=DEFAULT_POINTS, method='lttb'):
+    # Indices to keep; NaN rows are dropped first
+    y = np.asarray(y, dtype=np.float64)
+    keep = np.flatnonzero(np.isfinite(y))
+    if len(keep) <= n: return keep
+    if method == 'lttb': return keep[lttb_indices(np.asarray(x)[keep], y[keep], n)]
+    if method == 'minmax': return keep[minmax_indices(y[keep], n)]
+    raise ValueError(f"Unknown method '{method}', expected one of {METHODS}")
+
+def downsample_frame(df, x='time', y='price', n=DEFAULT_POINTS, method='lttb'):
+    return df.iloc[downsample(df[x].to_numpy(), df[y].to_numpy(), n, method)].reset_index(drop=True)
+
+def percentile_bands(paths, percentiles=(5, 25, 50, 75, 95)):
+    # (steps x sims) path matrix -> {percentile: per-step value}, so a fan chart ships
+    # len(percentiles) lines instead of raw paths
+    return dict(zip(percentiles, np.percentile(paths, percentiles, axis=1)))
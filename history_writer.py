@@ -0,0 +1,152 @@
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+import database
+import metrics
+
+# --- Write-Behind History Queue ---
+# save_history(..., background=True) enqueues the row and returns immediately. A single
+# daemon thread drains the queue and writes batches with one executemany + commit, either
+# when BATCH_SIZE rows are waiting or FLUSH_INTERVAL_MS after the first row of a batch.
+# A full queue blocks the caller for up to PUT_TIMEOUT seconds (backpressure) and then
+# falls back to a synchronous insert so no audit row is ever dropped. A batch that fails to
+# commit is retried RETRIES times with doubling backoff (a locked database usually clears),
+# then written row by row, so only rows the database itself refuses are lost, each one
+# logged as a HISTORY_ROW event.
+
+BATCH_SIZE = 200
+FLUSH_INTERVAL_MS = 250
+MAX_QUEUE = 10_000
+PUT_TIMEOUT = 2.0
+RETRIES = 3
+RETRY_BACKOFF_MS = 50
+
+_STOP = object()
+
+class HistoryWriter:
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval_ms=FLUSH_INTERVAL_MS, max_queue=MAX_QUEUE, put_timeout=PUT_TIMEOUT,
+                 retries=RETRIES, retry_backoff_ms=RETRY_BACKOFF_MS):
+        self.batch_size, self.flush_interval = batch_size, flush_interval_ms / 1000
+        self.put_timeout, self.retries, self.retry_backoff = put_timeout, retries, retry_backoff_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"enqueued": 0, "written": 0, "flushes": 0, "failed": 0, "blocked_puts": 0,
+                       "sync_fallbacks": 0, "retries": 0, "row_fallbacks": 0, "last_flush_ms": 0.0, "max_flush_ms": 0.0, "total_flush_ms": 0.0}
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, username, coin, risk, vol, note=""):
+        row = (username, coin, risk, vol, datetime.now(), note)
+        try: self._queue.put_nowait(row)
+        except queue.Full:
+            self._count("blocked_puts")
+            try: self._queue.put(row, timeout=self.put_timeout)
+            except queue.Full:
+                self._count("sync_fallbacks")
+                database.save_history_many([row])
+                return
+        self._count("enqueued")
+
+    def flush(self, timeout=None):
+        # Block until everything enqueued so far has been committed
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline: return False
+            time.sleep(0.005)
+        return True
+
+    def stop(self, timeout=10):
+        with self._lock: thread = self._thread
+        if thread is None or not thread.is_alive(): return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def counters(self):
+        with self._lock: stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_flush_ms"] = stats["total_flush_ms"] / stats["flushes"] if stats["flushes"] else 0.0
+        return stats
+
+    def _count(self, key, n=1):
+        with self._lock: self._stats[key] += n
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch, stop = [], item is _STOP
+            if not stop: batch.append(item)
+            deadline = time.monotonic() + self.flush_interval
+            while not stop and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: break
+                try: item = self._queue.get(timeout=remaining)
+                except queue.Empty: break
+                if item is _STOP: stop = True
+                else: batch.append(item)
+            if stop:  # drain whatever is left before exiting
+                while True:
+                    try: item = self._queue.get_nowait()
+                    except queue.Empty: break
+                    if item is not _STOP: batch.append(item)
+                    else: self._queue.task_done()
+            self._write(batch)
+            for _ in range(len(batch) + (1 if stop else 0)): self._queue.task_done()
+            if stop: return
+
+    def _write(self, batch):
+        if not batch: return
+        t0 = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            try:
+                database.save_history_many(batch)
+                break
+            except Exception as e:
+                error = e
+            if attempt < self.retries:
+                self._count("retries")
+                time.sleep(self.retry_backoff * 2 ** attempt)
+        else:
+            metrics.event("HISTORY_FLUSH", "FAILED", f"{len(batch)} rows after {self.retries} retries, writing row by row: {error}")
+            self._write_rows(batch)
+            return
+        ms = (time.perf_counter() - t0) * 1000
+        metrics.observe("history_writer.flush", ms)
+        with self._lock:
+            s = self._stats
+            s["written"] += len(batch); s["flushes"] += 1
+            s["last_flush_ms"] = ms; s["max_flush_ms"] = max(s["max_flush_ms"], ms); s["total_flush_ms"] += ms
+
+    def _write_rows(self, batch):
+        # Last resort for a batch that keeps failing: one transaction per row (keeping each
+        # row's queued timestamp), so a single bad row cannot take the rest down with it
+        written = 0
+        for row in batch:
+            try:
+                database.save_history_many([row]); written += 1
+            except Exception as e:
+                self._count("failed")
+                metrics.event("HISTORY_ROW", "FAILED", f"{row[0]} {row[1]} at {row[4]}: {e}")
+        with self._lock: self._stats["written"] += written; self._stats["row_fallbacks"] += len(batch)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = HistoryWriter()
+            atexit.register(_writer.stop)
+        return _writer.start()
+
+def writer_counters():
+    # Counters of the running writer, or None if nothing has been queued in this process
+    return _writer.counters() if _writer is not None else None
@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import glob
+import os
+import sys
+import time
+import numpy as np
+import bar_store
+import metrics
+
+# --- Intraday Bar Ingestion ---
+# asyncio pipeline from local feed stand-ins into bar_store. Sources put per-symbol batches
+# of bars on a bounded queue; one consumer buffers them per symbol and appends a symbol's
+# buffer when it reaches BATCH_SIZE bars or FLUSH_INTERVAL_MS after its first bar (file
+# appends run in a worker thread). Run one ingesting process per store.
+#   python ingest.py watch drop/                  # ingest *.csv dropped into drop/
+#   python ingest.py serve --port 9009            # newline-delimited bars over TCP
+#   python ingest.py replay bars.csv --port 9009 --speed 60   # replay a file at 60x
+# Bar rows are `symbol,time,open,high,low,close[,volume]` or `symbol,time,price`; time is
+# ISO-8601 or epoch seconds. A csv with a header may use those names in any order.
+
+BATCH_SIZE = 5000
+FLUSH_INTERVAL_MS = 500
+MAX_QUEUE = 1000  # batches, not bars
+POLL_SECONDS = 1.0
+FIELDS = ('symbol', 'time', 'open', 'high', 'low', 'close', 'volume')
+
+def _epoch_ns(values):
+    # ISO strings or epoch seconds -> int64 ns
+    arr = np.asarray(values)
+    try: return (np.asarray(arr, dtype=np.float64) * 1e9).astype(np.int64)
+    except ValueError:
+        import pandas as pd
+        return pd.to_datetime(arr, utc=True).tz_localize(None).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+def parse_rows(rows):
+    # [[symbol, time, ...], ...] -> {symbol: BAR_DTYPE array}; rows whose symbol the store
+    # would refuse are dropped here (counted in ingest.rows_rejected) so they never reach a flush
+    by_symbol, rejected = {}, 0
+    for r in rows:
+        if len(r) < 3: continue
+        symbol = r[0].strip()
+        if not bar_store._SYMBOL.match(symbol): rejected += 1; continue
+        by_symbol.setdefault(symbol, []).append(r)
+    if rejected:
+        metrics.incr("ingest.rows_rejected", rejected)
+        print(f"rejected {rejected} rows with invalid symbols", file=sys.stderr)
+    out = {}
+    for symbol, rs in by_symbol.items():
+        times = _epoch_ns([r[1].strip() for r in rs])
+        if all(len(r) == 3 for r in rs):
+            p = np.array([float(r[2]) for r in rs])
+            out[symbol] = bar_store.make_bars(times.view('datetime64[ns]'), p, p, p, p)
+        else:
+            v = np.array([[float(x) for x in (r[2:7] + ['0'] * (7 - len(r)))] for r in rs])
+            out[symbol] = bar_store.make_bars(times.view('datetime64[ns]'), v[:, 0], v[:, 1], v[:, 2], v[:, 3], v[:, 4])
+    return out
+
+def read_drop_file(path):
+    import pandas as pd
+    df = pd.read_csv(path, dtype={'symbol': str})
+    cols = [c.lower() for c in df.columns]
+    if 'symbol' not in cols:  # headerless: re-read positionally
+        df = pd.read_csv(path, header=None, dtype={0: str})
+        df.columns = ['symbol', 'time', 'price'] if df.shape[1] == 3 else list(FIELDS[:df.shape[1]])
+    else: df.columns = cols
+    if 'price' in df.columns and 'close' not in df.columns:
+        for c in ('open', 'high', 'low', 'close'): df[c] = df['price']
+    df['symbol'] = df['symbol'].astype(str).str.strip()
+    bad = sorted(s for s in set(df['symbol']) if not bar_store._SYMBOL.match(s))
+    if bad: raise ValueError(f"invalid symbol(s) {', '.join(map(repr, bad[:5]))}")  # reject the whole file
+    out = {}
+    for symbol, g in df.groupby('symbol', sort=False):
+        times = _epoch_ns(g['time'].to_numpy()).view('datetime64[ns]')
+        out[str(symbol)] = bar_store.make_bars(times, g['open'], g['high'], g['low'], g['close'], g['volume'] if 'volume' in g else None)
+    return out
+
+class Ingestor:
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval_ms=FLUSH_INTERVAL_MS, max_queue=MAX_QUEUE):
+        self.batch_size, self.flush_interval = batch_size, flush_interval_ms / 1000
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self._buffers = {}  # symbol -> (first_seen monotonic, [arrays], bar count)
+        self.stats = {"received": 0, "written": 0, "ignored": 0, "flushes": 0, "failed": 0}
+        self._flush_lock = asyncio.Lock()  # one append at a time keeps each symbol's batches in order
+        self._failures = {}  # symbol -> last append error, until take_failures()
+
+    async def put(self, batches):
+        for symbol, bars in batches.items():
+            if len(bars): await self.queue.put((symbol, bars))  # blocks when full: backpressure to the source
+
+    async def run(self):
+        ticker = asyncio.create_task(self._tick())
+        try:
+            while True:
+                symbol, bars = await self.queue.get()
+                first, arrays, n = self._buffers.get(symbol, (time.monotonic(), [], 0))
+                self._buffers[symbol] = (first, arrays + [bars], n + len(bars))
+                self.stats["received"] += len(bars)
+                if n + len(bars) >= self.batch_size: await self._flush(symbol)
+                self.queue.task_done()
+        finally: ticker.cancel()
+
+    async def _tick(self):
+        # Time-based flushes; kept off the consumer so queue.get() is never cancelled mid-item
+        while True:
+            await asyncio.sleep(self.flush_interval / 4)
+            now = time.monotonic()
+            for symbol in [s for s, (t, _, _) in self._buffers.items() if now - t >= self.flush_interval]:
+                await self._flush(symbol)
+
+    async def drain(self):
+        await self.queue.join()
+        for symbol in list(self._buffers): await self._flush(symbol)
+
+    def take_failures(self):
+        failures, self._failures = self._failures, {}
+        return failures
+
+    async def _flush(self, symbol):
+        # A failed append is logged and recorded per symbol, never raised: this runs inside
+        # the consumer and ticker tasks, and either one dying would stall the whole pipeline
+        async with self._flush_lock:
+            if symbol not in self._buffers: return
+            _, arrays, n = self._buffers.pop(symbol)
+            t0 = time.perf_counter()
+            try: written, ignored = await asyncio.to_thread(bar_store.append, symbol, np.concatenate(arrays))
+            except Exception as e:
+                self._failures[symbol] = str(e); self.stats["failed"] += n
+                metrics.event("INGEST_FLUSH", "FAILED", f"{symbol}: {e}")
+                print(f"flush of {n} bars for {symbol} failed: {e}", file=sys.stderr)
+                return
+        metrics.observe("ingest.flush", (time.perf_counter() - t0) * 1000)
+        self.stats["written"] += written; self.stats["ignored"] += ignored; self.stats["flushes"] += 1
+
+def _finish_file(path, error=None):
+    if error is None:
+        os.replace(path, path + '.done')
+        metrics.event("INGEST_FILE", "SUCCESS", os.path.basename(path))
+    else:
+        os.replace(path, path + '.failed')
+        metrics.event("INGEST_FILE", "FAILED", f"{os.path.basename(path)}: {error}")
+        print(f"failed {path}: {error}", file=sys.stderr)
+
+async def watch_dir(ingestor, directory, poll=POLL_SECONDS, once=False):
+    # *.csv files are ingested oldest first. A poll's files are queued, the ingestor is
+    # drained, and only then is each file renamed: *.csv.done if every symbol in it was
+    # appended, else *.csv.failed (dropping it again is safe, bars at or before a symbol's
+    # stored tail are ignored). A file still being written should be dropped under another
+    # name and renamed into place when complete.
+    while True:
+        queued = []
+        for path in sorted(glob.glob(os.path.join(directory, '*.csv')), key=os.path.getmtime):
+            try:
+                batches = await asyncio.to_thread(read_drop_file, path)
+                await ingestor.put(batches); queued.append((path, batches.keys()))
+            except Exception as e: _finish_file(path, e)
+        if queued:
+            await ingestor.drain()
+            failures = ingestor.take_failures()
+            for path, syms in queued:
+                _finish_file(path, '; '.join(f"{s}: {failures[s]}" for s in syms if s in failures) or None)
+        if once: return
+        await asyncio.sleep(poll)
+
+async def serve(ingestor, host='127.0.0.1', port=9009):
+    async def handle(reader, writer):
+        # Whatever arrived in one read becomes one batch; a partial last line waits for the next
+        rest = b''
+        while True:
+            chunk = await reader.read(1 << 16)
+            lines = (rest + chunk).split(b'\n')
+            rest = lines.pop() if chunk else b''
+            rows = [r for r in (l.decode().strip().split(',') for l in lines if l.strip()) if r[0].lower() != 'symbol']
+            if rows:
+                try: await ingestor.put(parse_rows(rows))
+                except ValueError as e: print(f"bad batch from {writer.get_extra_info('peername')}: {e}", file=sys.stderr)
+            if not chunk: break
+        writer.close()
+    return await asyncio.start_server(handle, host, port)
+
+async def replay(path, host='127.0.0.1', port=9009, speed=0.0):
+    # Streams a bar csv to the socket; speed > 0 paces it at `speed` x real time
+    _, writer = await asyncio.open_connection(host, port)
+    with open(path) as f:
+        prev = None
+        for i, line in enumerate(f):
+            if i == 0 and line.lower().startswith('symbol'): continue
+            if speed > 0:
+                t = _epoch_ns([line.split(',')[1]])[0] / 1e9
+                if prev is not None and t > prev: await asyncio.sleep((t - prev) / speed)
+                prev = t
+            writer.write(line.encode() if line.endswith('\n') else (line + '\n').encode())
+            if i % 1000 == 0: await writer.drain()
+    await writer.drain(); writer.close(); await writer.wait_closed()
+
+async def _main(args):
+    if args.cmd == 'replay':
+        await replay(args.path, args.host, args.port, args.speed); return
+    ingestor = Ingestor()
+    consumer = asyncio.create_task(ingestor.run())
+    try:
+        if args.cmd == 'watch':
+            await watch_dir(ingestor, args.directory, args.poll, once=args.once)
+            await ingestor.drain()
+        else:
+            server = await serve(ingestor, args.host, args.port)
+            print(f"listening on {args.host}:{args.port}", file=sys.stderr)
+            async with server: await server.serve_forever()
+    finally:
+        consumer.cancel()
+        print(f"ingest stats: {ingestor.stats}", file=sys.stderr)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Ingest intraday bars into the append-only bar store")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    w = sub.add_parser('watch', help="ingest csv files dropped into a directory")
+    w.add_argument('directory'); w.add_argument('--poll', type=float, default=POLL_SECONDS)
+    w.add_argument('--once', action='store_true', help="ingest what is there now and exit")
+    for name in ('serve', 'replay'):
+        p = sub.add_parser(name, help="listen for bars over TCP" if name == 'serve' else "replay a bar csv to a serve socket")
+        if name == 'replay':
+            p.add_argument('path'); p.add_argument('--speed', type=float, default=0.0, help="x real time, 0 = as fast as possible")
+        p.add_argument('--host', default='127.0.0.1'); p.add_argument('--port', type=int, default=9009)
+    args = ap.parse_args(argv)
+    try: asyncio.run(_main(args))
+    except KeyboardInterrupt: pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import io
+import os
+import numpy as np
+import metrics
+from downsample import percentile_bands
+from report_cache import BlobStore, make_key
+
+# --- Monte Carlo Summary Cache ---
+# A forecast is fully determined by (asset, data version, horizon, sims, seed, model), so
+# its result is memoized across reruns and sessions. Only a compact summary is kept: per-day
+# percentile bands, terminal quantiles, the mean and a few sample paths - a few KB instead
+# of the (days x sims) matrix. Storage is report_cache.BlobStore (byte-bounded in-memory
+# LRU, plus unless VELOXIS_MC_CACHE is set to '' .npz files in CACHE_DIR trimmed to
+# MAX_DISK_ENTRIES); only the summary's serialization lives here.
+
+CACHE_DIR = os.environ.get('VELOXIS_MC_CACHE', '.mc_cache')
+MAX_MEMORY_BYTES = 16 * 2**20
+MAX_DISK_ENTRIES = 512
+BAND_PERCENTILES = (5, 25, 50, 75, 95)
+TERMINAL_PERCENTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+SAMPLE_PATHS = 20
+
+def summarize(paths, sample=SAMPLE_PATHS):
+    # (days x sims) path matrix -> summary dict of small arrays
+    terminal = paths[-1]
+    return {
+        "band_percentiles": np.array(BAND_PERCENTILES),
+        "bands": np.array(list(percentile_bands(paths, BAND_PERCENTILES).values())),
+        "terminal_percentiles": np.array(TERMINAL_PERCENTILES),
+        "terminal_quantiles": np.percentile(terminal, TERMINAL_PERCENTILES),
+        "mean": np.float64(terminal.mean()),
+        "sample": paths[:, :sample].astype(np.float32),
+    }
+
+def band(summary, p):
+    return summary["bands"][list(summary["band_percentiles"]).index(p)]
+
+def terminal_quantile(summary, p):
+    return float(summary["terminal_quantiles"][list(summary["terminal_percentiles"]).index(p)])
+
+class SummaryCache(BlobStore):
+    # report_cache's LRU + disk store holding summary dicts, written as .npz files
+    SUFFIX = '.npz'
+    LOAD_ERRORS = (OSError, ValueError)
+
+    def __init__(self, directory=CACHE_DIR, max_memory_bytes=MAX_MEMORY_BYTES, max_disk_entries=MAX_DISK_ENTRIES):
+        super().__init__(directory, max_memory_bytes, max_disk_entries, name='mc')
+
+    def _size(self, summary):
+        return sum(np.asarray(v).nbytes for v in summary.values())
+
+    def _dump(self, summary):
+        buf = io.BytesIO(); np.savez(buf, **summary)
+        return buf.getvalue()
+
+    def _load(self, path):
+        with np.load(path) as npz: return {k: npz[k][()] if npz[k].ndim == 0 else npz[k] for k in npz.files}
+
+store = SummaryCache()
+
+def get_or_compute(key, compute):
+    # Cached summary for key, or compute() -> summary (None is returned but not cached)
+    digest = make_key(*key)
+    summary = store.get(digest)
+    if summary is None:
+        with metrics.timer("mc_cache.compute"): summary = compute()
+        if summary is not None: store.put(digest, summary)
+    return summary
@@ -0,0 +1,87 @@
+import functools
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# --- In-Process Metrics ---
+# Latencies are kept per name in ring buffers of the last WINDOW samples (ms), counters are
+# plain integers, and notable events go to a bounded log. Everything is process-local and
+# stdlib-only so any module can record without pulling in numpy/pandas; snapshot() can
+# persist the current percentiles to the `metrics` table.
+
+WINDOW = 2048
+MAX_EVENTS = 500
+
+_lock = threading.Lock()
+_timings = defaultdict(lambda: deque(maxlen=WINDOW))
+_totals = defaultdict(int)  # lifetime sample count per timing, beyond the window
+_counters = defaultdict(int)
+_events = deque(maxlen=MAX_EVENTS)
+
+def observe(name, ms):
+    with _lock:
+        _timings[name].append(ms); _totals[name] += 1
+
+def incr(name, n=1):
+    with _lock: _counters[name] += n
+
+def event(kind, status="SUCCESS", details=""):
+    with _lock: _events.append((datetime.now().strftime("%Y-%m-%d %H:%M:%S"), kind, status, details))
+
+@contextmanager
+def timer(name):
+    t0 = time.perf_counter()
+    try: yield
+    finally: observe(name, (time.perf_counter() - t0) * 1000)
+
+def timed(name):
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with timer(name): return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def _percentile(ordered, q):
+    # Linear interpolation between closest ranks (numpy's default)
+    pos = (len(ordered) - 1) * q / 100
+    lo = int(pos); hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+def summary(prefix=""):
+    with _lock: samples = {k: (sorted(v), _totals[k]) for k, v in _timings.items() if k.startswith(prefix) and v}
+    return [{"name": k, "count": total, "p50_ms": _percentile(s, 50), "p95_ms": _percentile(s, 95),
+             "p99_ms": _percentile(s, 99), "max_ms": s[-1]} for k, (s, total) in sorted(samples.items())]
+
+def combined(prefix):
+    # Percentiles over every sample whose name starts with prefix (e.g. all 'db.' calls)
+    with _lock: s = sorted(x for k, v in _timings.items() if k.startswith(prefix) for x in v)
+    if not s: return None
+    return {"count": len(s), "p50_ms": _percentile(s, 50), "p95_ms": _percentile(s, 95), "p99_ms": _percentile(s, 99)}
+
+def counters(prefix=""):
+    with _lock: return {k: v for k, v in sorted(_counters.items()) if k.startswith(prefix)}
+
+def hit_rate(cache):
+    c = counters(f"cache.{cache}.")
+    hits, misses = c.get(f"cache.{cache}.hit", 0), c.get(f"cache.{cache}.miss", 0)
+    return hits / (hits + misses) if hits + misses else None
+
+def recent_events(limit=50):
+    with _lock: return list(_events)[-limit:][::-1]
+
+def snapshot():
+    # Persist the current percentiles and counters to the metrics table
+    import database
+    ts = datetime.now()
+    rows = [(ts, r["name"], r["count"], r["p50_ms"], r["p95_ms"], r["p99_ms"]) for r in summary()]
+    rows += [(ts, k, v, None, None, None) for k, v in counters().items()]
+    database.save_metrics(rows)
+    event("METRICS_SNAPSHOT", "SUCCESS", f"{len(rows)} series persisted")
+    return len(rows)
+
+def reset():
+    with _lock:
+        _timings.clear(); _totals.clear(); _counters.clear(); _events.clear()
@@ -0,0 +1,149 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import metrics
+
+# --- Vectorized Monte Carlo Engine ---
+# Shocks are drawn in whole (steps x sims) blocks from a numpy Generator instead of one
+# np.random.normal call per step. model='arithmetic' reproduces the original p * (1 + e)
+# stepping; model='gbm' uses log-normal steps exp(e - s^2/2) so prices stay positive.
+
+MODELS = ('arithmetic', 'gbm')
+DEFAULT_CHUNK = 100_000
+PORTFOLIO_CHUNK = 25_000
+WORKERS = int(os.environ.get('VELOXIS_MC_WORKERS', 0)) or os.cpu_count() or 1
+
+def _daily_vol(vol):
+    return max(vol, 0.01) / np.sqrt(365)
+
+def _growth(rng, daily_vol, steps, sims, model):
+    shocks = rng.normal(0.0, daily_vol, size=(steps, sims))
+    if model == 'gbm':
+        shocks -= 0.5 * daily_vol ** 2
+        return np.exp(shocks, out=shocks)
+    if model == 'arithmetic':
+        shocks += 1.0
+        return shocks
+    raise ValueError(f"Unknown model '{model}', expected one of {MODELS}")
+
+def _chunk_sizes(sims, chunk_size):
+    full, rest = divmod(sims, chunk_size)
+    return [chunk_size] * full + ([rest] if rest else [])
+
+@metrics.timed("monte_carlo.paths")
+def simulate_paths(current_price, vol, days=30, sims=1000, seed=None, model='arithmetic'):
+    # Full (days x sims) matrix, row 0 is today's price
+    rng = np.random.default_rng(seed)
+    paths = np.empty((days, sims))
+    paths[0] = current_price
+    if days > 1:
+        np.cumprod(_growth(rng, _daily_vol(vol), days - 1, sims, model), axis=0, out=paths[1:])
+        paths[1:] *= current_price
+    return paths
+
+@metrics.timed("monte_carlo.terminal")
+def simulate_terminal(current_price, vol, days=30, sims=1000, seed=None, model='arithmetic',
+                      percentiles=(5, 50, 95), chunk_size=DEFAULT_CHUNK):
+    # Streams sims in fixed-size blocks and keeps only the terminal prices, so peak memory is
+    # bounded by chunk_size * days rather than sims * days. Each block draws from its own
+    # child of SeedSequence(seed), so a seeded run is reproducible for a given chunk_size.
+    daily_vol = _daily_vol(vol)
+    sizes = _chunk_sizes(sims, chunk_size)
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    terminal = np.empty(sims)
+    start = 0
+    for n, ss in zip(sizes, streams):
+        rng = np.random.default_rng(ss)
+        if days > 1:
+            terminal[start:start + n] = _growth(rng, daily_vol, days - 1, n, model).prod(axis=0)
+        else:
+            terminal[start:start + n] = 1.0
+        start += n
+    terminal *= current_price
+    return {
+        "terminal": terminal,
+        "percentiles": {p: float(v) for p, v in zip(percentiles, np.percentile(terminal, percentiles))},
+        "mean": float(terminal.mean()),
+    }
+
+# --- Portfolio Simulation ---
+# Correlated daily shocks e = z @ L.T, where L is the Cholesky factor of the daily return
+# covariance, applied to buy-and-hold positions (weights are fractions of the starting
+# value, which is normalised to 1). Sims are split into chunks of chunk_size, each drawing
+# from its own child of SeedSequence(seed), so a seeded result depends only on seed and
+# chunk_size - not on whether chunks run in-process or on the process pool. Per chunk only
+# (chunk_size x assets) shocks are live; the portfolio value path is kept for every sim
+# as float32 to build the percentile bands.
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def _get_pool(workers):
+    # Spawned (not forked) workers: the Streamlit server process is multi-threaded
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None: _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+        return _pool
+
+def cholesky(cov):
+    from risk_engine import nearest_psd
+    try: return np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError: return np.linalg.cholesky(nearest_psd(cov))
+
+def _portfolio_chunk(seed_seq, chol, weights, steps, sims, model):
+    rng = np.random.default_rng(seed_seq)
+    half_var = 0.5 * np.einsum('ij,ij->i', chol, chol)  # diag(L @ L.T) / 2
+    level = np.ones((sims, len(weights)))
+    z, e = np.empty_like(level), np.empty_like(level)
+    values = np.empty((steps + 1, sims), dtype=np.float32)
+    values[0] = 1.0
+    for t in range(steps):
+        rng.standard_normal(out=z); np.matmul(z, chol.T, out=e)
+        if model == 'gbm':
+            e -= half_var; np.exp(e, out=e)
+        else:
+            e += 1.0
+        level *= e
+        values[t + 1] = level @ weights
+    return values
+
+@metrics.timed("monte_carlo.portfolio")
+def simulate_portfolio(cov, weights, days=30, sims=10_000, seed=None, model='gbm', percentiles=(5, 50, 95),
+                       levels=(0.95, 0.99), chunk_size=PORTFOLIO_CHUNK, workers=None):
+    # cov: daily (assets x assets) return covariance. Returns the portfolio value bands per
+    # day (row 0 = today = 1.0), terminal values, and VaR/CVaR as positive fractions of the
+    # starting value lost over the horizon at each confidence level.
+    if model not in MODELS: raise ValueError(f"Unknown model '{model}', expected one of {MODELS}")
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.sum() <= 0: raise ValueError("Portfolio weights must sum to a positive value")
+    weights = weights / weights.sum()
+    chol = cholesky(np.asarray(cov, dtype=np.float64))
+    steps = max(days - 1, 0)
+    sizes = _chunk_sizes(sims, chunk_size)
+    jobs = [(ss, chol, weights, steps, n, model) for n, ss in zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes)))]
+    workers = min(workers or WORKERS, len(jobs))
+    if workers > 1:
+        pool = _get_pool(workers)
+        chunks = list(pool.map(_portfolio_chunk, *zip(*jobs)))
+    else:
+        chunks = [_portfolio_chunk(*job) for job in jobs]
+    values = np.concatenate(chunks, axis=1)
+
+    terminal = values[-1].astype(np.float64)
+    loss = 1.0 - terminal
+    var = np.percentile(loss, [l * 100 for l in levels])
+    cvar = [loss[loss >= v].mean() for v in var]
+    return {
+        "terminal": terminal,
+        "bands": {p: b for p, b in zip(percentiles, np.percentile(values, percentiles, axis=1))},
+        "percentiles": {p: float(v) for p, v in zip(percentiles, np.percentile(terminal, percentiles))},
+        "mean": float(terminal.mean()),
+        "var": {l: float(v) for l, v in zip(levels, var)},
+        "cvar": {l: float(v) for l, v in zip(levels, cvar)},
+    }
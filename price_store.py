@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+import metrics
+
+# --- Parse-Once Columnar Price Store ---
+# Each merged OHLCV csv is parsed once and written as one .npy per field (Close, High, ...)
+# laid out (columns x dates), plus a shared date index. Cache entries are keyed by the
+# sha1 of the source bytes, so byte-identical copies share one entry, and loads are
+# memory-mapped. A manifest of (mtime_ns, size, sha1) per source path avoids re-hashing
+# unchanged files; any mtime/size change forces a re-hash and, if the bytes changed, a rebuild.
+
+CACHE_DIR = os.environ.get('VELOXIS_PRICE_CACHE', '.price_cache')
+MANIFEST = 'manifest.json'
+
+_lock = threading.RLock()
+_tables = {}  # abs source path -> (fingerprint, PriceTable)
+
+class PriceTable:
+    def __init__(self, version, dates, fields, labels):
+        self.version = version  # sha1 of the source file
+        self.dates = dates      # datetime64[ns], sorted, no NaT
+        self.fields = fields    # field -> memmap of shape (n_columns, n_dates)
+        self.labels = labels    # pandas-style column label ('Close.1') -> (field, row)
+
+    @property
+    def columns(self):
+        return list(self.labels)
+
+    def column(self, label):
+        # Contiguous row of the memmap: a view, no copy
+        field, row = self.labels[label]
+        return self.fields[field][row]
+
+    def field_labels(self, field):
+        return [l for l, (f, _) in self.labels.items() if f == field]
+
+def _field_of(label):
+    base, _, suffix = label.rpartition('.')
+    return base if base and suffix.isdigit() else label
+
+def _fingerprint(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def _sha1(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''): h.update(block)
+    return h.hexdigest()
+
+def _read_manifest():
+    try:
+        with open(os.path.join(CACHE_DIR, MANIFEST)) as f: return json.load(f)
+    except (OSError, ValueError): return {}
+
+def _write_manifest(manifest):
+    tmp = os.path.join(CACHE_DIR, f'{MANIFEST}.{os.getpid()}.tmp')
+    with open(tmp, 'w') as f: json.dump(manifest, f)
+    os.replace(tmp, os.path.join(CACHE_DIR, MANIFEST))
+
+def _build(source, entry_dir):
+    df = pd.read_csv(source)
+    date_col = 'Date' if 'Date' in df.columns else df.columns[0]
+    dates = pd.to_datetime(df[date_col], errors='coerce')
+    df = df[dates.notna().to_numpy()].assign(**{date_col: dates[dates.notna()]}).sort_values(date_col, kind='stable')
+
+    layout = {}
+    for label in df.columns:
+        if label == date_col: continue
+        layout.setdefault(_field_of(label), []).append(label)
+
+    tmp = f'{entry_dir}.{os.getpid()}.tmp'  # per process: batch scans may build in parallel
+    shutil.rmtree(tmp, ignore_errors=True); os.makedirs(tmp)
+    np.save(os.path.join(tmp, 'dates.npy'), df[date_col].to_numpy(dtype='datetime64[ns]'))
+    for field, labels in layout.items():
+        block = np.ascontiguousarray(df[labels].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64).T)
+        np.save(os.path.join(tmp, f'{field}.npy'), block)
+    with open(os.path.join(tmp, 'columns.json'), 'w') as f: json.dump(layout, f)
+    if os.path.exists(os.path.join(entry_dir, 'columns.json')):
+        shutil.rmtree(tmp, ignore_errors=True)  # another process published the same bytes first
+        return
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    try: os.replace(tmp, entry_dir)
+    except OSError: shutil.rmtree(tmp, ignore_errors=True)
+
+def _open(version, entry_dir):
+    with open(os.path.join(entry_dir, 'columns.json')) as f: layout = json.load(f)
+    dates = np.load(os.path.join(entry_dir, 'dates.npy'), mmap_mode='r')
+    fields, labels = {}, {}
+    for field, cols in layout.items():
+        fields[field] = np.load(os.path.join(entry_dir, f'{field}.npy'), mmap_mode='r')
+        for row, label in enumerate(cols): labels[label] = (field, row)
+    return PriceTable(version, dates, fields, labels)
+
+def load(source):
+    path = os.path.abspath(source)
+    fp = _fingerprint(path)
+    with _lock:
+        cached = _tables.get(path)
+        if cached and cached[0] == fp:
+            metrics.incr("cache.price_store.hit")
+            return cached[1]
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        manifest = _read_manifest()
+        entry = manifest.get(path)
+        if entry and (entry['mtime_ns'], entry['size']) == fp: version = entry['sha1']
+        else:
+            version = _sha1(path)
+            manifest[path] = {'mtime_ns': fp[0], 'size': fp[1], 'sha1': version}
+            _write_manifest(manifest)
+            stale = entry and entry['sha1']
+            if stale and stale != version and all(e['sha1'] != stale for e in manifest.values()):
+                shutil.rmtree(os.path.join(CACHE_DIR, stale), ignore_errors=True)
+
+        entry_dir = os.path.join(CACHE_DIR, version)
+        if os.path.exists(os.path.join(entry_dir, 'columns.json')): metrics.incr("cache.price_store.hit")
+        else:
+            metrics.incr("cache.price_store.miss")
+            with metrics.timer("price_store.build"): _build(path, entry_dir)
+            metrics.event("PRICE_CACHE_BUILD", "SUCCESS", f"{os.path.basename(path)} -> {version[:12]}")
+        table = _open(version, entry_dir)
+        _tables[path] = (fp, table)
+        return table
+
+def clear():
+    with _lock:
+        _tables.clear()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
@@ -0,0 +1,90 @@
+import builtins
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+# --- Startup / Rerun Profiler ---
+# Enabled with VELOXIS_PROFILE=1. Times every first-time import (inclusive and self time)
+# and named sections of each Streamlit rerun, and appends one JSON line per rerun to
+# VELOXIS_PROFILE_LOG. When disabled every call is a no-op.
+
+ENABLED = os.environ.get('VELOXIS_PROFILE', '') not in ('', '0', 'false')
+LOG_PATH = os.environ.get('VELOXIS_PROFILE_LOG', 'veloxis_profile.log')
+
+_lock = threading.Lock()
+_imports = []      # (module, inclusive_ms, self_ms) since the last flushed rerun
+_local = threading.local()
+_runs = 0
+_original_import = builtins.__import__
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    stack = getattr(_local, 'stack', None)
+    if stack is None: stack = _local.stack = []
+    stack.append(0.0)
+    t0 = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        inclusive = (time.perf_counter() - t0) * 1000
+        children = stack.pop()
+        if stack: stack[-1] += inclusive
+        with _lock: _imports.append((name, round(inclusive, 3), round(inclusive - children, 3)))
+
+def install():
+    if ENABLED and builtins.__import__ is not _timed_import:
+        builtins.__import__ = _timed_import
+
+def _finish(record, complete):
+    # An interrupted run's last section has no known end, so it is left out of the record
+    name, t0 = record.pop('_open')
+    t_start = record.pop('_t0')
+    if complete:
+        record['sections'][name] = record['sections'].get(name, 0.0) + (time.perf_counter() - t0) * 1000
+        record['total_ms'] = round((time.perf_counter() - t_start) * 1000, 3)
+    else:
+        record['total_ms'] = round(sum(record['sections'].values()), 3)
+        record['interrupted_in'] = name
+    record['sections'] = {k: round(v, 3) for k, v in record['sections'].items()}
+    record['complete'] = complete
+    with _lock:
+        record['imports'] = sorted(_imports, key=lambda i: -i[1])
+        _imports.clear()
+        with open(LOG_PATH, 'a') as f: f.write(json.dumps(record) + '\n')
+
+def start_run(store=None, **extra):
+    # Call at the top of the script. `store` is per-session state (st.session_state) so a
+    # rerun cut short by st.rerun()/st.stop() can be flushed, marked incomplete, next time.
+    global _runs
+    if not ENABLED: return
+    install()
+    if store is not None and store.get('_profile_run') is not None:
+        _finish(store['_profile_run'], complete=False)
+    with _lock: _runs += 1; run_id = _runs
+    now = time.perf_counter()
+    record = {'ts': datetime.now().isoformat(timespec='seconds'), 'run': run_id, 'pid': os.getpid(),
+              'sections': {}, '_t0': now, '_open': ('startup', now), **extra}
+    _local.run, _local.store = record, store
+    if store is not None: store['_profile_run'] = record
+
+def mark(name):
+    # Closes the current section and starts `name`; time until the next mark() goes to it
+    record = getattr(_local, 'run', None) if ENABLED else None
+    if record is None: return
+    prev, t0 = record['_open']
+    now = time.perf_counter()
+    record['sections'][prev] = record['sections'].get(prev, 0.0) + (now - t0) * 1000
+    record['_open'] = (name, now)
+
+def end_run(**extra):
+    record = getattr(_local, 'run', None) if ENABLED else None
+    if record is None: return
+    store = _local.store
+    _local.run = _local.store = None
+    if store is not None: store['_profile_run'] = None
+    record.update(extra)
+    _finish(record, complete=True)
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+# --- Report Cache ---
+# Content-addressed blob store for rendered PDFs and chart PNGs. A key is any tuple of
+# plain values (e.g. asset, data version, currency, user); its sha256 is the address.
+# Blobs live in a byte-bounded in-memory LRU backed by files in CACHE_DIR, which is
+# trimmed to MAX_DISK_ENTRIES by last use. request() renders misses on a small thread
+# pool so the page never waits on matplotlib/FPDF.
+
+CACHE_DIR = os.environ.get('VELOXIS_REPORT_CACHE', '.report_cache')
+MAX_MEMORY_BYTES = 64 * 2**20
+MAX_DISK_ENTRIES = 256
+WORKERS = 2
+
+def make_key(*parts):
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+class BlobStore:
+    # Byte-bounded in-memory LRU over an mtime-trimmed directory of files, one per digest
+    # (directory '' = memory only). Subclasses that cache something other than raw bytes
+    # override SUFFIX and _size/_dump/_load; hits and misses count as cache.<name>.*
+    SUFFIX = '.bin'
+    LOAD_ERRORS = (OSError,)
+
+    def __init__(self, directory=CACHE_DIR, max_memory_bytes=MAX_MEMORY_BYTES, max_disk_entries=MAX_DISK_ENTRIES, name='report'):
+        self.directory, self.max_memory_bytes, self.max_disk_entries, self.name = directory, max_memory_bytes, max_disk_entries, name
+        self._mem = OrderedDict()
+        self._mem_bytes = 0
+        self._lock = threading.Lock()
+
+    def _size(self, value): return len(value)
+    def _dump(self, value): return value
+    def _load(self, path):
+        with open(path, 'rb') as f: return f.read()
+
+    def _path(self, digest):
+        return os.path.join(self.directory, f'{digest}{self.SUFFIX}')
+
+    def get(self, digest):
+        with self._lock:
+            value = self._mem.get(digest)
+            if value is not None:
+                self._mem.move_to_end(digest); metrics.incr(f"cache.{self.name}.hit")
+                return value
+        if self.directory:
+            try: value = self._load(self._path(digest)); os.utime(self._path(digest))
+            except self.LOAD_ERRORS: value = None
+        if value is None:
+            metrics.incr(f"cache.{self.name}.miss")
+            return None
+        metrics.incr(f"cache.{self.name}.hit")
+        self._remember(digest, value)
+        return value
+
+    def put(self, digest, value):
+        self._remember(digest, value)
+        if not self.directory: return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self._path(digest) + f'.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f: f.write(self._dump(value))
+        os.replace(tmp, self._path(digest))
+        self._trim_disk()
+
+    def clear(self):
+        with self._lock: self._mem.clear(); self._mem_bytes = 0
+
+    def _remember(self, digest, value):
+        size = self._size(value)
+        with self._lock:
+            if digest in self._mem: self._mem_bytes -= self._size(self._mem.pop(digest))
+            self._mem[digest] = value; self._mem_bytes += size
+            while self._mem_bytes > self.max_memory_bytes and len(self._mem) > 1:
+                self._mem_bytes -= self._size(self._mem.popitem(last=False)[1])
+
+    def _trim_disk(self):
+        try: entries = [e for e in os.scandir(self.directory) if e.name.endswith(self.SUFFIX)]
+        except OSError: return
+        if len(entries) <= self.max_disk_entries: return
+        entries.sort(key=lambda e: e.stat().st_mtime_ns)
+        for e in entries[:len(entries) - self.max_disk_entries]:
+            try: os.remove(e.path)
+            except OSError: pass
+
+store = BlobStore()
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='report')
+_pending = {}
+_pending_lock = threading.Lock()
+
+def get_or_build(key, build):
+    # Synchronous: cached blob, or build() now and cache it
+    digest = make_key(*key)
+    blob = store.get(digest)
+    if blob is None:
+        blob = build()
+        store.put(digest, blob)
+    return blob
+
+def _run(digest, build):
+    try:
+        with metrics.timer("report.build"): blob = build()
+    except Exception as e:
+        metrics.event("REPORT_BUILD", "FAILED", str(e))
+        raise
+    store.put(digest, blob)
+    with _pending_lock: _pending.pop(digest, None)
+    return blob
+
+def request(key, build):
+    # Non-blocking: the cached blob, or None while build() runs on the worker pool.
+    # A failed build stays failed for its key: every later call re-raises its exception
+    # instead of resubmitting it, so a poller cannot rebuild a broken report every second.
+    digest = make_key(*key)
+    blob = store.get(digest)
+    if blob is not None: return blob
+    with _pending_lock:
+        future = _pending.get(digest)
+        if future is None:
+            blob = store.get(digest)  # finished between the first lookup and the lock
+            if blob is not None: return blob
+            _pending[digest] = _executor.submit(_run, digest, build)
+        elif future.done():
+            if future.exception() is not None: raise future.exception()
+            del _pending[digest]
+            return future.result()
+    return None
@@ -0,0 +1,107 @@
+import numpy as np
+
+# --- Batch Risk-Metric Engine ---
+# Every metric is computed for all assets at once from a (dates x assets) close matrix.
+# NaN marks a missing price; returns are taken against each asset's previous valid close,
+# rolling windows are counted in rows of the aligned matrix, and a window needs two
+# returns before it reports a volatility (same as pandas rolling(w, min_periods=1).std()).
+
+DEFAULT_WINDOWS = (7, 30, 90)
+EWMA_LAMBDA = 0.94  # RiskMetrics daily decay
+PERIODS = 365
+
+def _ffill_index(valid):
+    rows = np.arange(valid.shape[0])[:, None]
+    return np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+
+def simple_returns(closes):
+    valid = np.isfinite(closes)
+    prev = np.vstack([np.full((1, closes.shape[1]), -1), _ffill_index(valid)[:-1]])
+    prev_price = np.take_along_axis(closes, np.maximum(prev, 0), axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(valid & (prev >= 0), closes / prev_price - 1.0, np.nan)
+
+def rolling_vol(returns, window, periods=PERIODS):
+    valid = np.isfinite(returns)
+    r = np.where(valid, returns, 0.0)
+    zero = np.zeros((1, r.shape[1]))
+    c1 = np.vstack([zero, np.cumsum(r, axis=0)])
+    c2 = np.vstack([zero, np.cumsum(r * r, axis=0)])
+    cn = np.vstack([zero, np.cumsum(valid, axis=0)])
+    lo = np.maximum(np.arange(1, r.shape[0] + 1) - window, 0)
+    s1, s2, n = c1[1:] - c1[lo], c2[1:] - c2[lo], cn[1:] - cn[lo]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var = (s2 - s1 * s1 / n) / (n - 1)
+    return np.where(n >= 2, np.sqrt(np.maximum(var, 0.0)) * np.sqrt(periods), np.nan)
+
+def ewma_vol(returns, lam=EWMA_LAMBDA, periods=PERIODS):
+    # sigma2_t = lam * sigma2_{t-1} + (1 - lam) * r_t^2, seeded with the first squared return;
+    # a missing return carries the previous variance forward
+    out = np.full(returns.shape, np.nan)
+    var = np.full(returns.shape[1], np.nan)
+    for t in range(returns.shape[0]):
+        r2 = returns[t] * returns[t]
+        var = np.where(np.isnan(r2), var, np.where(np.isnan(var), r2, lam * var + (1.0 - lam) * r2))
+        out[t] = var
+    return np.sqrt(out) * np.sqrt(periods)
+
+def drawdowns(closes):
+    valid = np.isfinite(closes)
+    filled = np.take_along_axis(closes, np.maximum(_ffill_index(valid), 0), axis=0)
+    filled[~np.maximum.accumulate(valid, axis=0)] = np.nan  # nothing before the first close
+    peak = np.fmax.accumulate(filled, axis=0)
+    return filled / peak - 1.0
+
+def underwater_runs(dd):
+    # Length in rows of the current under-water spell at each row
+    under = dd < 0
+    c = np.cumsum(under, axis=0)
+    return c - np.maximum.accumulate(np.where(under, 0, c), axis=0)
+
+def compute_risk_metrics(closes, windows=DEFAULT_WINDOWS, lam=EWMA_LAMBDA, periods=PERIODS):
+    closes = np.asarray(closes, dtype=np.float64)
+    returns = simple_returns(closes)
+    dd = drawdowns(closes)
+    runs = underwater_runs(dd)
+    valid = np.isfinite(closes)
+    has_data = valid.any(axis=0)
+    last_row = np.where(has_data, closes.shape[0] - 1 - np.argmax(valid[::-1], axis=0), -1)
+    with np.errstate(invalid='ignore'):
+        max_dd = np.where(has_data, np.nanmin(np.where(np.isnan(dd), np.inf, dd), axis=0), np.nan)
+    return {
+        "returns": returns,
+        "vol": {w: rolling_vol(returns, w, periods) for w in windows},
+        "ewma_vol": ewma_vol(returns, lam, periods),
+        "drawdown": dd,
+        "max_drawdown": max_dd,
+        "dd_duration": runs.max(axis=0),
+        "current_dd_duration": runs[-1],
+        "last_row": last_row,
+    }
+
+def latest(metric, last_row):
+    # Value of a (dates x assets) metric at each asset's last valid close
+    cols = np.arange(metric.shape[1])
+    return np.where(last_row >= 0, metric[np.maximum(last_row, 0), cols], np.nan)
+
+def covariance(returns, min_periods=30, periods=1):
+    # Pairwise-complete covariance of a (dates x assets) returns matrix: each pair uses only
+    # the rows where both assets have a return. Pairs with fewer than min_periods overlapping
+    # rows are NaN. Scaled by `periods` (365 gives an annualized matrix).
+    valid = np.isfinite(returns)
+    x = np.where(valid, returns, 0.0)
+    m = valid.astype(np.float64)
+    n = m.T @ m                  # overlapping rows per pair
+    s = x.T @ m                  # s[i, j]: sum of asset i over rows where j is also valid
+    sxy = x.T @ x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = (sxy - s * s.T / n) / (n - 1)
+    return np.where(n >= max(min_periods, 2), cov * periods, np.nan)
+
+def nearest_psd(cov, floor=1e-12):
+    # Symmetric matrix with eigenvalues clipped to a small positive floor, so pairwise
+    # estimates and perfectly correlated columns still have a Cholesky factor
+    cov = (cov + cov.T) / 2
+    w, v = np.linalg.eigh(cov)
+    w = np.maximum(w, floor * max(w.max(), floor))
+    return (v * w) @ v.T
@@ -0,0 +1,134 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+# --- Headless Batch Risk Scanner ---
+# Scans every configured asset (analysis.FILE_MAP), or every Close column of the csv files
+# matching --glob, on a process pool and writes one consolidated summary. Work is split per
+# source file so each worker parses/memory-maps a file once and scans all of its columns.
+#   python scan.py                                        # all configured assets
+#   python scan.py --assets bitcoin solana --json out.json
+#   python scan.py --glob "data/*.csv" --csv scan.csv --workers 16
+#   python scan.py --save-history --user nightly           # bulk-insert into history
+
+COLUMNS = ["asset", "source", "column", "bars", "last_date", "price", "vol_30d", "risk_level", "max_drawdown", "error"]
+
+def _quiet():
+    # st.cache_data warns on every call outside a Streamlit runtime
+    import logging, warnings
+    warnings.filterwarnings("ignore")
+    for name in ("streamlit.runtime.caching.cache_data_api", "streamlit.runtime.scriptrunner_utils.script_run_context"):
+        logging.getLogger(name).setLevel(logging.ERROR)
+
+def _summarize(analysis, asset, source, column, df):
+    row = dict.fromkeys(COLUMNS); row.update(asset=asset, source=os.path.basename(source), column=column, bars=len(df))
+    if df.empty:
+        row["error"] = "no price data"; return row
+    vol = float(df['vol_30d'].iloc[-1])
+    row.update(last_date=str(df['time'].iloc[-1])[:10], price=float(df['price'].iloc[-1]), vol_30d=vol,
+               risk_level=analysis.classify_risk(vol), max_drawdown=float(analysis.calculate_max_drawdown(df)))
+    return row
+
+def scan_file(path, coin_ids=None):
+    # Configured assets go through analysis.get_data (streamed tail bars included); a bare
+    # csv has every Close column scanned straight off the price store
+    _quiet()
+    import analysis, price_store
+    t0 = time.perf_counter()
+    try:
+        if coin_ids:
+            rows = [_summarize(analysis, c, path, analysis.COL_MAP.get(c, ""), analysis.get_data(c)) for c in coin_ids]
+        else:
+            table = price_store.load(path)
+            labels = table.field_labels('Close') or table.columns
+            stem = os.path.splitext(os.path.basename(path))[0]
+            rows = [_summarize(analysis, f"{stem}:{l}", path, l, analysis.price_frame(table.dates, table.column(l))) for l in labels]
+    except Exception as e:
+        rows = [{**dict.fromkeys(COLUMNS), "asset": c, "source": os.path.basename(path), "error": str(e)} for c in (coin_ids or [path])]
+    return rows, (time.perf_counter() - t0) * 1000
+
+def plan(assets=None, patterns=None):
+    # {source path: [coin ids]} for configured assets, {path: None} for globbed files
+    import analysis
+    if patterns:
+        paths = sorted({os.path.abspath(p) for pat in patterns for p in glob.glob(pat, recursive=True)})
+        return {p: None for p in paths}
+    groups = defaultdict(list)
+    for c in assets or analysis.FILE_MAP:
+        if c not in analysis.FILE_MAP: raise SystemExit(f"Unknown asset '{c}', configured: {', '.join(analysis.FILE_MAP)}")
+        groups[analysis.FILE_MAP[c]].append(c)
+    return dict(groups)
+
+def run(jobs, workers):
+    rows = []
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            futures = {pool.submit(scan_file, p, ids): p for p, ids in jobs.items()}
+            for f in as_completed(futures):
+                out, ms = f.result(); rows += out
+                print(f"  {os.path.basename(futures[f]):<48} {len(out):>4} series {ms:>9.1f} ms", file=sys.stderr)
+    else:
+        for p, ids in jobs.items():
+            out, ms = scan_file(p, ids); rows += out
+            print(f"  {os.path.basename(p):<48} {len(out):>4} series {ms:>9.1f} ms", file=sys.stderr)
+    return sorted(rows, key=lambda r: (r["error"] is not None, -(r["vol_30d"] or 0), r["asset"]))
+
+def write_csv(rows, path):
+    import csv
+    with open(path, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=COLUMNS); w.writeheader(); w.writerows(rows)
+
+def write_json(rows, path, meta):
+    with open(path, "w") as f: json.dump({**meta, "rows": rows}, f, indent=1)
+
+def save_results(rows, user, note):
+    # history.coin holds display names for configured assets, as written by the app
+    from analysis import COIN_NAMES
+    from database import init_db, save_history_many
+    init_db()
+    ts = datetime.now()
+    batch = [(user, COIN_NAMES.get(r["asset"], r["asset"]), r["risk_level"], r["vol_30d"], ts, note) for r in rows if r["error"] is None]
+    save_history_many(batch)
+    return len(batch)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Batch risk scan over configured assets or csv files")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--assets", nargs="+", metavar="COIN_ID", help="subset of configured coin ids (default: all)")
+    src.add_argument("--glob", nargs="+", metavar="PATTERN", help="scan every Close column of matching csv files")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--csv", metavar="PATH", help="write the summary as csv")
+    ap.add_argument("--json", metavar="PATH", help="write the summary as json")
+    ap.add_argument("--save-history", action="store_true", help="bulk-insert results into the history table")
+    ap.add_argument("--user", default="scanner", help="history owner for --save-history")
+    ap.add_argument("--note", default="Batch Scan")
+    args = ap.parse_args(argv)
+
+    _quiet()
+    jobs = plan(args.assets, args.glob)
+    if not jobs: raise SystemExit("Nothing to scan")
+    t0 = time.perf_counter()
+    rows = run(jobs, args.workers)
+    elapsed = time.perf_counter() - t0
+    errors = sum(r["error"] is not None for r in rows)
+
+    print(f"{'asset':<40} {'price':>14} {'vol_30d':>9} {'max_dd':>8}  risk")
+    for r in rows:
+        if r["error"]: print(f"{r['asset']:<40} ERROR: {r['error']}")
+        else: print(f"{r['asset']:<40} {r['price']:>14,.4f} {r['vol_30d']:>9.2%} {r['max_drawdown']:>8.2%}  {r['risk_level']}")
+    print(f"\n{len(rows)} series from {len(jobs)} file(s) in {elapsed:.2f}s, {errors} error(s)", file=sys.stderr)
+
+    meta = {"generated": datetime.now().isoformat(timespec="seconds"), "files": len(jobs), "elapsed_s": round(elapsed, 3)}
+    if args.csv: write_csv(rows, args.csv)
+    if args.json: write_json(rows, args.json, meta)
+    if args.save_history: print(f"saved {save_results(rows, args.user, args.note)} history row(s) for '{args.user}'", file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import metrics
+
+# --- Historical & Bootstrap Stress Engine ---
+# Works on a (dates x assets) simple-returns matrix, NaN = no return. Losses are positive
+# fractions of value, so VaR/CVaR at level 0.99 answer "how much is lost on the worst 1%".
+# Historical VaR reads empirical quantiles of overlapping h-day returns over a rolling
+# window. The block bootstrap resamples whole rows (all assets on the same dates, so
+# cross-asset dependence and volatility clusters inside a block survive): path sums of
+# log returns are taken from a prefix-sum array as C[start + len] - C[start], so every
+# path is a handful of index gathers and nothing loops per path.
+
+LEVELS = (0.95, 0.99)
+DEFAULT_BLOCK = 10
+CHUNK_ROWS = 256  # rolling windows evaluated per batch to bound the (rows x assets x window) view
+
+def horizon_returns(returns, horizon):
+    # Overlapping compounded h-day returns; row t covers returns t-h+1..t (NaN if any missing)
+    valid = np.isfinite(returns)
+    zero = np.zeros((1, returns.shape[1]))
+    c = np.vstack([zero, np.cumsum(np.where(valid, np.log1p(returns), 0.0), axis=0)])
+    cn = np.vstack([zero, np.cumsum(valid, axis=0)])
+    out = np.full(returns.shape, np.nan)
+    if horizon <= returns.shape[0]:
+        out[horizon - 1:] = np.where(cn[horizon:] - cn[:-horizon] == horizon, np.expm1(c[horizon:] - c[:-horizon]), np.nan)
+    return out
+
+def tail_risk(returns, levels=LEVELS, axis=0):
+    # VaR and CVaR (expected shortfall) of a sample of returns along `axis`, NaN-aware.
+    # One sort serves every level: VaR interpolates between order statistics (numpy's
+    # 'linear' quantile) and CVaR averages the losses >= VaR from a prefix sum.
+    loss = np.moveaxis(-np.asarray(returns, dtype=np.float64), axis, -1)
+    s = np.sort(loss, axis=-1)  # NaNs sort last
+    k = np.isfinite(s).sum(axis=-1)
+    csum = np.concatenate([np.zeros(s.shape[:-1] + (1,)), np.cumsum(np.where(np.isfinite(s), s, 0.0), axis=-1)], axis=-1)
+    total = np.take_along_axis(csum, k[..., None], -1)[..., 0]
+    var, cvar = {}, {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for l in levels:
+            pos = np.maximum(k - 1, 0) * l
+            lo = np.floor(pos).astype(np.int64); hi = np.minimum(lo + 1, np.maximum(k - 1, 0))
+            s_lo, s_hi = np.take_along_axis(s, lo[..., None], -1)[..., 0], np.take_along_axis(s, hi[..., None], -1)[..., 0]
+            v = np.where(k > 0, s_lo + (s_hi - s_lo) * (pos - lo), np.nan)
+            first = (s < v[..., None]).sum(axis=-1)  # losses below VaR
+            tail = total - np.take_along_axis(csum, first[..., None], -1)[..., 0]
+            var[l], cvar[l] = v, np.where(k > 0, tail / (k - first), np.nan)
+    return var, cvar
+
+@metrics.timed("stress.historical")
+def historical_var(returns, window=365, horizon=1, levels=LEVELS, min_periods=None):
+    # Rolling historical VaR/CVaR: {level: (dates x assets)} arrays, NaN before the first full
+    # window and wherever a window holds fewer than min_periods (default half) h-day returns
+    hr = horizon_returns(np.asarray(returns, dtype=np.float64), horizon)
+    rows, n = hr.shape
+    min_periods = min_periods or max(window // 2, 2)
+    var = {l: np.full((rows, n), np.nan) for l in levels}
+    cvar = {l: np.full((rows, n), np.nan) for l in levels}
+    if rows < window: return {"var": var, "cvar": cvar}
+    view = sliding_window_view(hr, window, axis=0)  # (rows - window + 1, n, window), no copy
+    counts = np.isfinite(hr).astype(np.int64)
+    counts = np.vstack([np.zeros((1, n), np.int64), np.cumsum(counts, axis=0)])
+    enough = (counts[window:] - counts[:-window]) >= min_periods
+    for lo in range(0, view.shape[0], CHUNK_ROWS):
+        block = view[lo:lo + CHUNK_ROWS]
+        ok = enough[lo:lo + CHUNK_ROWS]
+        if not ok.any(): continue
+        v, c = tail_risk(np.where(ok[..., None], block, np.nan), levels, axis=-1)
+        for l in levels:
+            var[l][window - 1 + lo:window - 1 + lo + len(block)] = v[l]
+            cvar[l][window - 1 + lo:window - 1 + lo + len(block)] = c[l]
+    return {"var": var, "cvar": cvar}
+
+@metrics.timed("stress.bootstrap")
+def block_bootstrap(returns, horizon, paths=5000, block=DEFAULT_BLOCK, seed=None):
+    # (paths x assets) compounded h-day returns from circular moving-block resampling of
+    # the complete rows of `returns`
+    r = np.asarray(returns, dtype=np.float64)
+    r = r[np.isfinite(r).all(axis=1)]
+    rows, n = r.shape
+    if rows < 2: raise ValueError("Need at least two dates with returns for every asset")
+    block = max(1, min(block, rows))
+    logr = np.log1p(r)
+    c = np.vstack([np.zeros((1, n)), np.cumsum(np.vstack([logr, logr]), axis=0)])  # doubled for wrap-around
+    full, rest = divmod(horizon, block)
+    rng = np.random.default_rng(seed)
+    total = np.zeros((paths, n))
+    if full:
+        starts = rng.integers(0, rows, size=(paths, full))
+        total += (c[starts + block] - c[starts]).sum(axis=1)
+    if rest:
+        starts = rng.integers(0, rows, size=paths)
+        total += c[starts + rest] - c[starts]
+    return np.expm1(total)
+
+def portfolio(asset_returns, weights):
+    # Buy-and-hold portfolio return from per-asset returns (last axis = assets)
+    w = np.asarray(weights, dtype=np.float64)
+    return asset_returns @ (w / w.sum())
+
+def gaussian_var(returns, horizon, levels=LEVELS):
+    # Normal-theory VaR from the sample std, for contrast with the empirical tails
+    from statistics import NormalDist
+    sd = np.nanstd(returns, axis=0, ddof=1) * np.sqrt(horizon)
+    return {l: NormalDist().inv_cdf(l) * sd for l in levels}
@@ -0,0 +1,142 @@
+import numpy as np
+import metrics
+from risk_engine import PERIODS
+
+# --- Volatility Model Suite ---
+# Range-based and recursive volatility estimators over (dates x assets) arrays, NaN = no bar.
+# Parkinson and Garman-Klass read each bar's high/low (and open/close) range, which carries
+# several times the information of one close-to-close return; their rolling means come from
+# prefix sums as in risk_engine.rolling_vol. GARCH(1,1) is fitted per asset by Gaussian
+# likelihood with variance targeting (omega = v * (1 - alpha - beta), v = sample variance):
+# a coarse grid over (persistence, alpha share) is refined around each asset's best point,
+# and every candidate of every asset runs through the variance recursion together, so the
+# Python loop is over dates only. EWMA lives in risk_engine.ewma_vol.
+
+RANGE_WINDOW = 30
+GARCH_GRID = 8          # points per axis of the coarse grid
+GARCH_REFINE = 6        # zoom passes over a 3 x 3 neighbourhood, halving the step each time
+GARCH_LOOKBACK = 1000   # most recent returns used for the fit
+GARCH_MIN_OBS = 60      # assets with fewer returns get NaN parameters
+PERSISTENCE_RANGE = (0.0, 0.999)  # alpha + beta; fits that end on either bound are flagged
+LOG_EVERY = 32          # rows per running-product flush in garch_filter
+
+def _rolling_mean(x, window, min_periods=1):
+    valid = np.isfinite(x)
+    zero = np.zeros((1, x.shape[1]))
+    c = np.vstack([zero, np.cumsum(np.where(valid, x, 0.0), axis=0)])
+    cn = np.vstack([zero, np.cumsum(valid, axis=0)])
+    lo = np.maximum(np.arange(1, x.shape[0] + 1) - window, 0)
+    s, n = c[1:] - c[lo], cn[1:] - cn[lo]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(n >= min_periods, s / n, np.nan)
+
+def _log_ratio(a, b):
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((a > 0) & (b > 0), np.log(a / b), np.nan)
+
+def parkinson_vol(high, low, window=RANGE_WINDOW, periods=PERIODS):
+    hl = _log_ratio(high, low)
+    hl = np.where(hl >= 0, hl, np.nan)  # high below low: bad bar
+    return np.sqrt(_rolling_mean(hl * hl, window) / (4 * np.log(2)) * periods)
+
+def garman_klass_vol(open_, high, low, close, window=RANGE_WINDOW, periods=PERIODS):
+    hl, co = _log_ratio(high, low), _log_ratio(close, open_)
+    hl = np.where(hl >= 0, hl, np.nan)
+    var = _rolling_mean(0.5 * hl * hl - (2 * np.log(2) - 1) * co * co, window)
+    return np.sqrt(np.maximum(var, 0.0) * periods)  # NaN stays NaN
+
+def _moments(returns):
+    # Per-asset mean, variance and count of the finite returns
+    valid = np.isfinite(returns)
+    n = valid.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mu = np.where(valid, returns, 0.0).sum(axis=0) / n
+        var = np.where(valid, (returns - mu) ** 2, 0.0).sum(axis=0) / n
+    return mu, var, n
+
+def garch_filter(returns, alpha, beta, var0, keep_path=False):
+    # Variance recursion h_t = omega + alpha * r_{t-1}^2 + beta * h_{t-1}, started at var0, for
+    # (K x assets) candidate parameters at once; returns are demeaned and a NaN row holds h.
+    # -> (log-likelihood up to a constant, variance forecast after the last row, [path])
+    # Work in units of var0 so h stays O(1): sum(log h) is then taken from a running product
+    # every LOG_EVERY rows instead of a log per row, without under- or overflow.
+    scale = np.asarray(var0, dtype=np.float64)
+    omega = 1.0 - alpha - beta
+    h = np.ones(np.broadcast(alpha, beta, scale).shape)
+    ll, prod, tmp = np.zeros_like(h), np.ones_like(h), np.empty_like(h)
+    path = np.empty((returns.shape[0],) + h.shape) if keep_path else None
+    r2 = returns * returns / scale
+    ok = np.isfinite(r2)
+    full = ok.all(axis=1)
+    for t in range(returns.shape[0]):
+        x = r2[t]
+        if keep_path: path[t] = h
+        if full[t]:  # in place: this branch is the whole cost of a fit
+            np.divide(x, h, out=tmp); ll -= tmp; prod *= h
+            h *= beta; h += omega; np.multiply(alpha, x, out=tmp); h += tmp
+        else:
+            m, x = ok[t], np.where(ok[t], x, 0.0)
+            ll -= x / h; prod *= np.where(m, h, 1.0)
+            h = np.where(m, omega + alpha * x + beta * h, h)
+        if t % LOG_EVERY == LOG_EVERY - 1: ll -= np.log(prod); prod[...] = 1.0
+    ll -= np.log(prod) + ok.sum(axis=0) * np.log(scale)
+    return 0.5 * ll, h * scale, None if path is None else path * scale
+
+def _params(z, w):
+    # Grid coordinates in [0, 1] -> (alpha, beta). z maps onto log(1 - persistence)
+    # quadratically, so the grid is as fine over persistence 0-0.8 as over 0.8-0.999; w^2 is
+    # alpha's share of the persistence, fine near 0 where small-alpha, high-beta fits sit
+    u_lo, u_hi = np.log(1.0 - PERSISTENCE_RANGE[1]), np.log(1.0 - PERSISTENCE_RANGE[0])
+    p = 1.0 - np.exp(u_hi + z * z * (u_lo - u_hi))
+    return w * w * p, (1.0 - w * w) * p
+
+@metrics.timed("vol_models.garch_fit")
+def garch_fit(returns, grid=GARCH_GRID, refine=GARCH_REFINE, lookback=GARCH_LOOKBACK, min_obs=GARCH_MIN_OBS, periods=PERIODS):
+    # Per-asset GARCH(1,1) fit of a (dates x assets) returns matrix. Parameters are (assets,)
+    # arrays (NaN where an asset has fewer than min_obs returns); 'vol' is the annualized
+    # conditional volatility per row and 'next_vol' the forecast for the day after the last.
+    returns = np.asarray(returns, dtype=np.float64)
+    mu, var0, n_obs = _moments(returns[-lookback:])
+    fit = (n_obs >= min_obs) & (var0 > 0)
+    r = returns[-lookback:, fit] - mu[fit]
+    v = var0[fit]
+    z_axis = s_axis = np.linspace(0.0, 1.0, grid)
+    z, s = (a.ravel()[:, None] for a in np.meshgrid(z_axis, s_axis))
+    ll, _, _ = garch_filter(r, *_params(z, s), v)
+    best = np.argmax(ll, axis=0)
+    bz, bs, bll = z[best, 0], s[best, 0], ll[best, np.arange(len(v))]
+    dz, ds = z_axis[1] - z_axis[0], s_axis[1] - s_axis[0]
+    offsets = np.array([-1.0, 0.0, 1.0])
+    for _ in range(refine):
+        # 3 x 3 neighbourhood of every asset's incumbent (which is the centre point, so no pass can lose ground)
+        oz, os_ = (a.ravel()[:, None] for a in np.meshgrid(offsets * dz, offsets * ds))
+        cz, cs = np.clip(bz + oz, 0.0, 1.0), np.clip(bs + os_, 0.0, 1.0)
+        ll, _, _ = garch_filter(r, *_params(cz, cs), v)
+        best = np.argmax(ll, axis=0)
+        cols = np.arange(len(v))
+        bz, bs, bll = cz[best, cols], cs[best, cols], ll[best, cols]
+        dz, ds = dz / 2, ds / 2
+
+    n = returns.shape[1]
+    out = {k: np.full(n, np.nan) for k in ("alpha", "beta", "omega", "persistence", "loglik", "long_run_vol", "next_vol")}
+    out["n_obs"], out["at_bound"] = n_obs, np.zeros(n, dtype=bool)
+    out["vol"] = np.full(returns.shape, np.nan)
+    if not fit.any(): return out
+    alpha, beta = _params(bz, bs)
+    _, h_next, path = garch_filter(returns[:, fit] - mu[fit], alpha, beta, v, keep_path=True)
+    out["alpha"][fit], out["beta"][fit], out["omega"][fit] = alpha, beta, v * (1.0 - alpha - beta)
+    out["persistence"][fit], out["loglik"][fit] = alpha + beta, bll
+    out["at_bound"][fit] = (bz <= 0.0) | (bz >= 1.0)  # persistence pinned to PERSISTENCE_RANGE: not an interior estimate
+    out["long_run_vol"][fit] = np.sqrt(v * periods)
+    out["next_vol"][fit] = np.sqrt(h_next * periods)
+    out["vol"][:, fit] = np.sqrt(path * periods)
+    return out
+
+def garch_term_vol(next_vol, long_run_vol, persistence, days):
+    # Annualized volatility matching the average GARCH variance forecast over the next `days`:
+    # E[h_{T+k}] = v + p^(k-1) * (h_{T+1} - v)
+    v1, vbar, p = np.square(next_vol), np.square(long_run_vol), np.asarray(persistence, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        decay = np.where(p < 1.0, (1.0 - p ** days) / ((1.0 - p) * days), 1.0)
+    return np.sqrt(vbar + (v1 - vbar) * decay)
@@ -0,0 +1,159 @@
+import json
+import os
+import tempfile
+from collections import deque
+import numpy as np
+import pandas as pd
+import price_store
+
+# --- Incremental Volatility State ---
+# One VolState per asset keeps running sums of the last `window` returns plus the running
+# peak, so a new bar updates vol_30d, drawdown and the latest price in O(1). Bars that
+# arrive after the source csv are appended to <asset>.tail.csv (time, price, vol_30d) and
+# the state is saved to <asset>.json, both next to the price cache. A bar at or before the
+# last seen time is a backfill and triggers a full rebuild from the source + tail.
+
+STATE_DIR = os.path.join(price_store.CACHE_DIR, 'state')
+TAIL_COLUMNS = ['time', 'price', 'vol_30d']
+
+class VolState:
+    def __init__(self, window=30, periods=365):
+        self.window, self.periods = window, periods
+        self.returns = deque(maxlen=window)
+        self.sum_r = self.sum_r2 = 0.0
+        self.n_bars = 0
+        self.last_time = self.last_price = None
+        self.peak = self.drawdown = self.max_drawdown = 0.0
+        self.source_version = None
+
+    @property
+    def vol(self):
+        n = len(self.returns)
+        if n < 2: return 0.0
+        var = (self.sum_r2 - self.sum_r * self.sum_r / n) / (n - 1)
+        return float(np.sqrt(max(var, 0.0)) * np.sqrt(self.periods))
+
+    def update(self, time, price):
+        price = float(price)
+        if self.last_price is not None:
+            r = price / self.last_price - 1.0
+            if len(self.returns) == self.window:
+                old = self.returns[0]; self.sum_r -= old; self.sum_r2 -= old * old
+            self.returns.append(r); self.sum_r += r; self.sum_r2 += r * r
+        self.n_bars += 1
+        if self.n_bars % self.window == 0:  # re-anchor the running sums against float drift
+            self.sum_r = float(sum(self.returns)); self.sum_r2 = float(sum(r * r for r in self.returns))
+        self.last_time, self.last_price = pd.Timestamp(time), price
+        self.peak = max(self.peak, price)
+        self.drawdown = price / self.peak - 1.0
+        self.max_drawdown = min(self.max_drawdown, self.drawdown)
+        return self.vol
+
+    @classmethod
+    def from_series(cls, times, prices, window=30, periods=365):
+        state = cls(window, periods)
+        for t, p in zip(times, prices):
+            if np.isfinite(p): state.update(t, p)
+        return state
+
+    def to_dict(self):
+        return {
+            'window': self.window, 'periods': self.periods, 'returns': list(self.returns),
+            'n_bars': self.n_bars, 'last_time': self.last_time.isoformat() if self.last_time is not None else None,
+            'last_price': self.last_price, 'peak': self.peak, 'drawdown': self.drawdown,
+            'max_drawdown': self.max_drawdown, 'source_version': self.source_version,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls(d['window'], d['periods'])
+        state.returns.extend(d['returns'])
+        state.sum_r = float(sum(state.returns)); state.sum_r2 = float(sum(r * r for r in state.returns))
+        state.n_bars, state.last_price = d['n_bars'], d['last_price']
+        state.last_time = pd.Timestamp(d['last_time']) if d['last_time'] else None
+        state.peak, state.drawdown, state.max_drawdown = d['peak'], d['drawdown'], d['max_drawdown']
+        state.source_version = d['source_version']
+        return state
+
+def _path(key, suffix):
+    return os.path.join(STATE_DIR, f'{key}{suffix}')
+
+def load_state(key):
+    try:
+        with open(_path(key, '.json')) as f: return VolState.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError): return None
+
+def _replace(path, write):
+    # write(f) into a unique temp file next to `path`, then rename it over `path`: readers
+    # that rebuild the same asset concurrently never share (or clobber) a temp file
+    os.makedirs(STATE_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=STATE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', newline='') as f: write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp); raise
+
+def save_state(key, state):
+    _replace(_path(key, '.json'), lambda f: json.dump(state.to_dict(), f))
+
+def tail_version(key):
+    try:
+        st = os.stat(_path(key, '.tail.csv'))
+        return f'{st.st_mtime_ns}-{st.st_size}'
+    except OSError: return '0'
+
+_tails = {}  # key -> (tail_version, frame)
+
+def read_tail(key):
+    version = tail_version(key)
+    cached = _tails.get(key)
+    if cached and cached[0] == version: return cached[1]
+    if version == '0': tail = pd.DataFrame({'time': pd.Series(dtype='datetime64[ns]'), 'price': [], 'vol_30d': []})
+    else: tail = pd.read_csv(_path(key, '.tail.csv'), parse_dates=['time'])
+    _tails[key] = (version, tail)
+    return tail
+
+def _write_tail(key, tail):
+    _replace(_path(key, '.tail.csv'), lambda f: tail[TAIL_COLUMNS].to_csv(f, index=False))
+
+def rebuild(key, times, prices, version, tail=None):
+    # Full recompute: replay the source history, then every tail bar after it
+    state = VolState.from_series(times, prices)
+    state.source_version = version
+    tail = read_tail(key) if tail is None else tail
+    if state.last_time is not None: tail = tail[tail['time'] > state.last_time]
+    tail = tail.sort_values('time', kind='stable').drop_duplicates('time', keep='last').reset_index(drop=True)
+    tail['vol_30d'] = [state.update(t, p) for t, p in zip(tail['time'], tail['price'])]
+    _write_tail(key, tail)
+    save_state(key, state)
+    return state
+
+def get_state(key, times, prices, version):
+    state = load_state(key)
+    if state is None or state.source_version != version:
+        state = rebuild(key, times, prices, version)
+    return state
+
+def append_bars(key, bars, times, prices, version):
+    # bars: iterable of (time, price). times/prices/version describe the source history and
+    # are only read when the state is missing, stale, or a backfill forces a rebuild.
+    state = get_state(key, times, prices, version)
+    source_end = pd.Timestamp(times[-1]) if len(times) else None
+    counts = {'appended': 0, 'backfilled': 0, 'ignored': 0}
+    rows, backfill = [], []
+    for t, p in bars:
+        t = pd.Timestamp(t)
+        if source_end is not None and t <= source_end: counts['ignored'] += 1  # the source file wins
+        elif state.last_time is None or t > state.last_time:
+            rows.append((t, float(p), state.update(t, p))); counts['appended'] += 1
+        else: backfill.append((t, float(p))); counts['backfilled'] += 1
+    if rows:
+        path = _path(key, '.tail.csv')
+        new_file = not os.path.exists(path)
+        pd.DataFrame(rows, columns=TAIL_COLUMNS).to_csv(path, mode='a', header=new_file, index=False)
+    if backfill:
+        merged = pd.concat([read_tail(key), pd.DataFrame(backfill, columns=['time', 'price'])], ignore_index=True)
+        state = rebuild(key, times, prices, version, tail=merged)
+    elif rows: save_state(key, state)
+    return state, counts